@@ -2,8 +2,26 @@
 
 import importlib.metadata
 
-from sphinxlint.sphinxlint import check_file, check_text
+from sphinxlint.sphinxlint import Linter, check_file, check_text
 
 __version__ = importlib.metadata.version("sphinx_lint")
 
-__all__ = ["check_text", "check_file"]
+
+def __getattr__(name):
+    # The asyncio API is imported on first use, so the command line (and
+    # its workers) don't pay for importing asyncio.
+    if name in {"alint_text", "alint_file", "alint_paths"}:
+        from sphinxlint import aio
+
+        return getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "Linter",
+    "check_text",
+    "check_file",
+    "alint_text",
+    "alint_file",
+    "alint_paths",
+]
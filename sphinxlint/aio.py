@@ -0,0 +1,154 @@
+"""Asyncio API, to lint from an event loop without blocking it.
+
+Linting runs in an executor shared by all calls, a process pool by
+default, so a service linting for many requests uses a bounded number
+of workers and keeps them warm between requests.
+"""
+
+import asyncio
+import gc
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from os.path import splitext
+
+from sphinxlint.pool import available_cpus, worker_context
+from sphinxlint.shared import MIN_SHARED_SIZE, Segments, opened, share_tracker
+from sphinxlint.sphinxlint import _linter
+
+_executor = None
+
+
+def get_executor():
+    """Return the executor linting runs in, creating it on first use."""
+    global _executor
+    if _executor is None:
+        share_tracker()  # Before starting workers, see alint_text.
+        _executor = ProcessPoolExecutor(
+            available_cpus(), mp_context=worker_context(), initializer=gc.freeze
+        )
+    return _executor
+
+
+def set_executor(executor):
+    """Use executor (any concurrent.futures.Executor) from now on."""
+    global _executor
+    _executor = executor
+
+
+def shutdown(cancel_futures=True):
+    """Stop the executor, if any, a new one being created if needed."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=cancel_futures)
+        _executor = None
+
+
+def _lint_text(filename, text, checkers, options):
+    return _linter(checkers, options).lint_text(filename, text)
+
+
+def _lint_shared_text(filename, batch, checkers, options):
+    with opened(batch) as [(_, data)]:
+        text = str(data, "utf-8", "surrogatepass")
+    return _lint_text(filename, text, checkers, options)
+
+
+def _lint_files(filenames, checkers, options):
+    return list(chain.from_iterable(_linter(checkers, options).lint_many(filenames)))
+
+
+async def _run(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
+
+
+async def alint_text(filename, text, checkers, options=None):
+    """Same as check_text, without blocking the event loop.
+
+    Big texts are sent to worker processes through shared memory.
+    """
+    checkers = frozenset(checkers)
+    if len(text) < MIN_SHARED_SIZE or not isinstance(
+        get_executor(), ProcessPoolExecutor
+    ):
+        return await _run(_lint_text, filename, text, checkers, options)
+    with Segments() as segments:
+        batch = segments.share([(filename, text.encode("utf-8", "surrogatepass"))])
+        return await _run(_lint_shared_text, filename, batch, checkers, options)
+
+
+async def alint_file(filename, checkers, options=None):
+    """Same as check_file, without blocking the event loop."""
+    return await _run(_lint_files, [filename], frozenset(checkers), options)
+
+
+def _files(paths, suffixes):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file in sorted(files):
+                    if splitext(file)[1] in suffixes:
+                        yield os.path.join(root, file)
+        else:
+            yield path
+
+
+# Files are sent to the workers in batches of about this many bytes, so
+# small files don't each pay for a round trip to a worker.
+BATCH_SIZE = 2**18
+
+
+def _batches(files, batch_size=BATCH_SIZE):
+    batch, size = [], 0
+    for filename in files:
+        batch.append(filename)
+        try:
+            size += os.path.getsize(filename)
+        except OSError:  # Reported by the worker.
+            pass
+        if size >= batch_size:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+async def alint_paths(paths, checkers, options=None, max_pending=None):
+    """Lint files and directories, yielding errors as files get checked.
+
+    Files are read by the workers, in batches of about BATCH_SIZE bytes,
+    and directories walked in a thread, so the event loop never waits on
+    the disk. At most max_pending batches (twice the number of CPUs by
+    default) are queued at once, so a slow consumer slows the linting
+    down instead of letting errors pile up. When the iteration stops
+    early (or is cancelled), queued batches are cancelled, only the ones
+    being checked are finished.
+    """
+    checkers = frozenset(checkers)
+    suffixes = {suffix for check in checkers for suffix in check.suffixes}
+    if max_pending is None:
+        max_pending = 2 * available_cpus()
+    batches = _batches(_files(paths, suffixes))
+    pending = set()
+    try:
+        while True:
+            while batches is not None and len(pending) < max_pending:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    batches = None
+                    break
+                pending.add(
+                    asyncio.ensure_future(_run(_lint_files, batch, checkers, options))
+                )
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                for error in future.result():
+                    yield error
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,38 @@
+"""Read files to lint from zip and tar archives, without extracting them."""
+
+import tarfile
+import zipfile
+from os.path import splitext
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIXES)
+
+
+def is_readable_archive(path):
+    if path.endswith(".zip"):
+        return zipfile.is_zipfile(path)
+    return tarfile.is_tarfile(path)
+
+
+def members(path, suffixes):
+    """Yield (name, data) pairs for the archive members having one of
+    the given suffixes, name being like `archive.tar.gz!path/inside.rst`.
+
+    Tar archives are read as a stream, so compressed ones are only
+    decompressed once, whatever their size.
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or splitext(info.filename)[1] not in suffixes:
+                    continue
+                yield f"{path}!{info.filename}", archive.read(info)
+        return
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            if not member.isfile() or splitext(member.name)[1] not in suffixes:
+                continue
+            yield f"{path}!{member.name}", archive.extractfile(member).read()
@@ -0,0 +1,76 @@
+"""Baselines: errors accepted in a tree, so only new ones get reported.
+
+An error is identified by its checker, its file, and the content of its
+line (whitespace being normalized), not its line number, so it's still
+recognized when lines are added or removed elsewhere in the file.
+"""
+
+from collections import Counter
+from hashlib import blake2b
+
+
+def fingerprint(checker_name, filename, line):
+    """Hash an error, see the module docstring, as a 64-bit int."""
+    key = "\0".join((checker_name, filename, " ".join(line.split())))
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Baseline:
+    """A set of accepted errors, as (checker_name, fingerprint) pairs
+    counted per file.
+
+    Written to disk one error per line, sorted, as:
+
+        <fingerprint, 16 hexadecimal digits> <checker name> <filename>
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, filename, checker_name, fingerprint, count=1):
+        entries = self.entries.setdefault(filename, Counter())
+        entries[checker_name, fingerprint] += count
+
+    def update(self, other):
+        for filename, entries in other.entries.items():
+            self.entries.setdefault(filename, Counter()).update(entries)
+
+    def accepted(self, filename):
+        """A copy of the entries of filename, to be consumed by matches."""
+        return Counter(self.entries.get(filename, ()))
+
+    def subset(self, filenames):
+        """The baseline restricted to the given files."""
+        baseline = Baseline()
+        for filename in filenames:
+            if filename in self.entries:
+                baseline.entries[filename] = self.entries[filename]
+        return baseline
+
+    def __iter__(self):
+        """Yield (filename, checker_name, fingerprint) triples, sorted."""
+        for filename in sorted(self.entries):
+            for (checker_name, fp), count in sorted(self.entries[filename].items()):
+                for _ in range(count):
+                    yield filename, checker_name, fp
+
+    def __len__(self):
+        return sum(entries.total() for entries in self.entries.values())
+
+    @classmethod
+    def read(cls, path):
+        """Read a baseline file, raising ValueError on malformed lines."""
+        baseline = cls()
+        with open(path, encoding="utf-8") as file:
+            for lno, line in enumerate(file, start=1):
+                try:
+                    fp, checker_name, filename = line.rstrip("\n").split(" ", 2)
+                    baseline.add(filename, checker_name, int(fp, 16))
+                except ValueError:
+                    raise ValueError(f"{path}:{lno}: malformed line") from None
+        return baseline
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for filename, checker_name, fp in self:
+                file.write(f"{fp:016x} {checker_name} {filename}\n")
@@ -1,4 +1,9 @@
 import os
+from functools import wraps
+from html.parser import HTMLParser
+from importlib import import_module
+from importlib.metadata import entry_points
+from itertools import chain
 
 import regex as re
 
@@ -7,17 +12,68 @@ from sphinxlint.utils import (
     clean_paragraph,
     escape2null,
     hide_non_rst_blocks,
+    hyperlinks,
     looks_like_glued,
     match_size,
-    paragraphs,
+    paragraph_features,
+    role_lines,
 )
 
 all_checkers = {}
 
+# Time taken by each checker on a 2.5 MB reST file, in milliseconds,
+# giving the default cost of the checkers (see checker), so the cheapest
+# ones run first, and failing early (--exit-first) is fast.
+CHECKER_COSTS = {
+    "missing-final-newline": 0,
+    "carriage-return": 20,
+    "horizontal-tab": 20,
+    "exclamation-and-tilde": 21,
+    "line-too-long": 23,
+    "trailing-whitespace": 25,
+    "backtick-before-role": 31,
+    "python-syntax": 47,
+    "dangling-hyphen": 55,
+    "triple-backticks": 56,
+    "unnecessary-parentheses": 64,
+    "role-with-extra-backtick": 70,
+    "missing-space-before-role": 71,
+    "directive-with-three-dots": 71,
+    "directive-missing-colons": 76,
+    "hyperlink-reference-missing-backtick": 84,
+    "missing-space-in-hyperlink": 92,
+    "missing-underscore-after-hyperlink": 94,
+    "unbalanced-inline-literals-delimiters": 105,
+    "missing-space-after-literal": 110,
+    "role-without-backticks": 116,
+    "missing-space-after-role": 122,
+    "missing-colon-in-role": 124,
+    "missing-space-before-default-role": 125,
+    "missing-backtick-after-role": 139,
+    "role-with-double-backticks": 154,
+    "default-role": 177,
+    "bad-dedent": 209,
+    "leaked-markup": 432,
+}
+DEFAULT_CHECKER_COST = 100
+
 
 def checker(*suffixes, **kwds):
-    """Decorator to register a function as a checker."""
-    checker_props = {"enabled": True, "rst_only": True}
+    """Decorator to register a function as a checker.
+
+    A checker is called as func(file, lines, options) and yields (lno,
+    msg) pairs, msg being a string, or a (format, *args) tuple only
+    formatted when printed (see sphinxlint.sphinxlint.format_message), so counting
+    errors doesn't pay for formatting them.
+
+    Big files are cut in chunks checked in parallel, see
+    Linter.split_file, unless the checker is whole_file (if it looks
+    further than the paragraph or block of a line, like at the last line).
+
+    The Linter runs the checkers by increasing cost, taken from
+    CHECKER_COSTS unless given.
+    """
+    checker_props = {"enabled": True, "rst_only": True, "whole_file": False}
 
     def deco(func):
         if not func.__name__.startswith("check_"):
@@ -26,13 +82,112 @@ def checker(*suffixes, **kwds):
             setattr(func, prop, kwds.get(prop, default_value))
         func.suffixes = suffixes
         func.name = func.__name__[len("check_") :].replace("_", "-")
+        func.description = func.__doc__
+        func.cost = kwds.get("cost", CHECKER_COSTS.get(func.name, DEFAULT_CHECKER_COST))
         all_checkers[func.name] = func
         return func
 
     return deco
 
 
-@checker(".py", rst_only=False)
+def paragraph_checker(*suffixes, needs=(), **kwds):
+    """Decorator to register a function as a paragraph checker.
+
+    The function is called as func(file, paragraph, options) for each
+    Paragraph of the file (tables excepted, we don't handle them yet)
+    having all the `needs` flags set, like "has_backtick", and yields
+    (lno, msg) pairs. The Linter runs all paragraph checkers in a
+    single walk over the paragraphs, while the registered checker can
+    still be run on its own, like any other.
+    """
+
+    def deco(func):
+        def accepts(paragraph):
+            return not paragraph.is_table and all(
+                getattr(paragraph, flag) for flag in needs
+            )
+
+        @wraps(func)
+        def check(file, lines, options=None):
+            for paragraph in paragraph_features(lines):
+                if accepts(paragraph):
+                    yield from func(file, paragraph, options)
+
+        check.per_paragraph = func
+        check.needs = tuple(sorted(needs))
+        return checker(*suffixes, **kwds)(check)
+
+    return deco
+
+
+class LazyChecker:
+    """A checker from the `sphinxlint.checkers` entry point group.
+
+    The entry point gives the spec of the checker, a mapping in a module
+    light to import, the checker module itself being only imported when
+    the checker is first run:
+
+        [project.entry-points."sphinxlint.checkers"]
+        my-check = "my_plugin.spec:MY_CHECK"
+
+    with, in my_plugin/spec.py:
+
+        MY_CHECK = {
+            "checker": "my_plugin.checkers:check_my_check",
+            "suffixes": [".rst", ".po"],
+            "enabled": False,  # Defaults to True.
+            "rst_only": True,  # Defaults to True.
+            "description": "Check for my issue.",
+            "cost": 100,  # Defaults to DEFAULT_CHECKER_COST.
+        }
+    """
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.checker = spec["checker"]
+        self.suffixes = tuple(spec["suffixes"])
+        self.enabled = spec.get("enabled", True)
+        self.rst_only = spec.get("rst_only", True)
+        self.description = spec.get("description", f"Plugin checker {self.checker}.")
+        self.cost = spec.get("cost", DEFAULT_CHECKER_COST)
+        self.whole_file = True  # As it may look at any line of the file.
+        self._func = None
+
+    @classmethod
+    def from_entry_point(cls, entry_point):
+        return cls(entry_point.name, entry_point.load())
+
+    def load(self):
+        if self._func is None:
+            module, _, attr = self.checker.partition(":")
+            func = import_module(module)
+            for part in attr.split("."):
+                func = getattr(func, part)
+            self._func = func
+        return self._func
+
+    def __call__(self, file, lines, options=None):
+        return self.load()(file, lines, options)
+
+    def __getstate__(self):
+        return {**self.__dict__, "_func": None}
+
+    def __eq__(self, other):
+        return isinstance(other, LazyChecker) and self.checker == other.checker
+
+    def __hash__(self):
+        return hash(self.checker)
+
+
+def load_plugins():
+    """Register the checkers of the `sphinxlint.checkers` entry point group,
+    only importing their specs, see LazyChecker."""
+    for entry_point in entry_points(group="sphinxlint.checkers"):
+        if entry_point.name not in all_checkers:
+            all_checkers[entry_point.name] = LazyChecker.from_entry_point(entry_point)
+
+
+@checker(".py", rst_only=False, whole_file=True)
 def check_python_syntax(file, lines, options=None):
     """Search invalid syntax in Python examples."""
     code = "".join(lines)
@@ -46,69 +201,66 @@ def check_python_syntax(file, lines, options=None):
         yield err.lineno, f"not compilable: {err}"
 
 
-@checker(".rst", ".po")
-def check_missing_backtick_after_role(file, lines, options=None):
+@paragraph_checker(".rst", ".po", needs=("has_backtick", "has_colon"))
+def check_missing_backtick_after_role(file, paragraph, options=None):
     """Search for roles missing their closing backticks.
 
     Bad:  :fct:`foo
     Good: :fct:`foo`
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        for error in rst.ROLE_MISSING_CLOSING_BACKTICK_RE.finditer(paragraph):
-            error_offset = paragraph[: error.start()].count("\n")
-            yield (
-                paragraph_lno + error_offset,
-                f"role missing closing backtick: {error.group(0)!r}",
-            )
+    for error in rst.ROLE_MISSING_CLOSING_BACKTICK_RE.finditer(
+        paragraph.text, concurrent=True
+    ):
+        error_offset = paragraph.text[: error.start()].count("\n")
+        yield (
+            paragraph.lno + error_offset,
+            ("role missing closing backtick: {!r}", error.group(0)),
+        )
 
 
 _RST_ROLE_RE = re.compile("``.+?``(?!`).", flags=re.DOTALL)
 _END_STRING_SUFFIX_RE = re.compile(rst.END_STRING_SUFFIX)
 
 
-@checker(".rst", ".po")
-def check_missing_space_after_literal(file, lines, options=None):
+@paragraph_checker(".rst", ".po", needs=("has_backtick",))
+def check_missing_space_after_literal(file, paragraph, options=None):
     r"""Search for inline literals immediately followed by a character.
 
     Bad:  ``items``s
     Good: ``items``\ s
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        paragraph = clean_paragraph(paragraph)
-        for role in _RST_ROLE_RE.finditer(paragraph):
-            if not _END_STRING_SUFFIX_RE.match(role[0][-1]):
-                error_offset = paragraph[: role.start()].count("\n")
-                yield (
-                    paragraph_lno + error_offset,
-                    "inline literal missing "
-                    f"(escaped) space after literal: {role.group(0)!r}",
-                )
+    text = paragraph.cleaned
+    for role in _RST_ROLE_RE.finditer(text, concurrent=True):
+        if not _END_STRING_SUFFIX_RE.match(role[0][-1]):
+            error_offset = text[: role.start()].count("\n")
+            yield (
+                paragraph.lno + error_offset,
+                (
+                    "inline literal missing (escaped) space after literal: {!r}",
+                    role.group(0),
+                ),
+            )
 
 
 _LONE_DOUBLE_BACKTICK_RE = re.compile("(?<!`)``(?!`)")
 
 
-@checker(".rst", ".po")
-def check_unbalanced_inline_literals_delimiters(file, lines, options=None):
+@paragraph_checker(".rst", ".po", needs=("has_backtick",))
+def check_unbalanced_inline_literals_delimiters(file, paragraph, options=None):
     r"""Search for unbalanced inline literals delimiters.
 
     Bad:  ``hello`` world``
     Good: ``hello`` world
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        paragraph = clean_paragraph(paragraph)
-        for lone_double_backtick in _LONE_DOUBLE_BACKTICK_RE.finditer(paragraph):
-            error_offset = paragraph[: lone_double_backtick.start()].count("\n")
-            yield (
-                paragraph_lno + error_offset,
-                "found an unbalanced inline literal markup.",
-            )
+    text = paragraph.cleaned
+    for lone_double_backtick in _LONE_DOUBLE_BACKTICK_RE.finditer(
+        text, concurrent=True
+    ):
+        error_offset = text[: lone_double_backtick.start()].count("\n")
+        yield (
+            paragraph.lno + error_offset,
+            "found an unbalanced inline literal markup.",
+        )
 
 
 _ends_with_role_tag = re.compile(rst.ROLE_TAG + "$").search
@@ -190,23 +342,20 @@ _SUSPICIOUS_ROLE = re.compile(
 )
 
 
-@checker(".rst", ".po")
-def check_missing_space_after_role(file, lines, options=None):
+@paragraph_checker(".rst", ".po", needs=("has_backtick", "has_colon"))
+def check_missing_space_after_role(file, paragraph, options=None):
     r"""Search for roles immediately followed by a character.
 
     Bad:  :exc:`Exception`s.
     Good: :exc:`Exceptions`\ s
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        paragraph = clean_paragraph(paragraph)
-        for role in _SUSPICIOUS_ROLE.finditer(paragraph):
-            error_offset = paragraph[: role.start()].count("\n")
-            yield (
-                paragraph_lno + error_offset,
-                f"role missing (escaped) space after role: {role.group(0)!r}",
-            )
+    text = paragraph.cleaned
+    for role in _SUSPICIOUS_ROLE.finditer(text):
+        error_offset = text[: role.start()].count("\n")
+        yield (
+            paragraph.lno + error_offset,
+            ("role missing (escaped) space after role: {!r}", role.group(0)),
+        )
 
 
 @checker(".rst", ".po")
@@ -216,9 +365,9 @@ def check_role_without_backticks(file, lines, options=None):
     Bad:  :func:pdb.main
     Good: :func:`pdb.main`
     """
-    for lno, line in enumerate(lines, start=1):
+    for lno, line in role_lines(lines):
         for no_backticks in rst.ROLE_WITH_NO_BACKTICKS_RE.finditer(line):
-            yield lno, f"role with no backticks: {no_backticks.group(0)!r}"
+            yield lno, ("role with no backticks: {!r}", no_backticks.group(0))
 
 
 @checker(".rst", ".po")
@@ -242,12 +391,9 @@ def check_missing_space_in_hyperlink(file, lines, options=None):
     Bad:  `Link text<https://example.com>`_
     Good: `Link text <https://example.com>`_
     """
-    for lno, line in enumerate(lines, start=1):
-        if "`" not in line:
-            continue
-        for match in rst.SEEMS_HYPERLINK_RE.finditer(line):
-            if not match.group(2):
-                yield lno, "missing space before < in hyperlink"
+    for lno, match in hyperlinks(lines):
+        if not match.group(2):
+            yield lno, "missing space before < in hyperlink"
 
 
 @checker(".rst", ".po")
@@ -266,23 +412,18 @@ def check_missing_underscore_after_hyperlink(file, lines, options=None):
     URLs within download directives don't need trailing underscores.
     https://www.sphinx-doc.org/en/master/usage/referencing.html#role-download
     """
-    for lno, line in enumerate(lines, start=1):
-        if "`" not in line:
-            continue
-        for match in rst.SEEMS_HYPERLINK_RE.finditer(line):
-            is_in_download = bool(match.group(1))
-            has_underscore = bool(match.group(3))
-
-            if is_in_download and has_underscore:
-                yield lno, "unnecessary underscore after closing backtick in hyperlink"
-            elif not is_in_download and not has_underscore:
-                yield lno, "missing underscore after closing backtick in hyperlink"
-            else:
-                continue
+    for lno, match in hyperlinks(lines):
+        is_in_download = bool(match.group(1))
+        has_underscore = bool(match.group(3))
 
+        if is_in_download and has_underscore:
+            yield lno, "unnecessary underscore after closing backtick in hyperlink"
+        elif not is_in_download and not has_underscore:
+            yield lno, "missing underscore after closing backtick in hyperlink"
 
-@checker(".rst", ".po")
-def check_role_with_double_backticks(file, lines, options=None):
+
+@paragraph_checker(".rst", ".po", needs=("has_backtick", "has_colon"))
+def check_role_with_double_backticks(file, paragraph, options=None):
     """Search for roles with double backticks.
 
     Bad:  :fct:``sum``
@@ -297,30 +438,23 @@ def check_role_with_double_backticks(file, lines, options=None):
     So to properly detect this one we're searching for actual inline
     literals that have a role tag.
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if "`" not in paragraph:
-            continue
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        paragraph = escape2null(paragraph)
-        while True:
-            inline_literal = min(
-                rst.INLINE_LITERAL_RE.finditer(paragraph, overlapped=True),
-                key=match_size,
-                default=None,
-            )
-            if inline_literal is None:
-                break
-            before = paragraph[: inline_literal.start()]
-            if _ends_with_role_tag(before):
-                error_offset = paragraph[: inline_literal.start()].count("\n")
-                yield (
-                    paragraph_lno + error_offset,
-                    "role use a single backtick, double backtick found.",
-                )
-            paragraph = (
-                paragraph[: inline_literal.start()] + paragraph[inline_literal.end() :]
+    text = paragraph.escaped
+    while True:
+        inline_literal = min(
+            rst.INLINE_LITERAL_RE.finditer(text, overlapped=True, concurrent=True),
+            key=match_size,
+            default=None,
+        )
+        if inline_literal is None:
+            break
+        before = text[: inline_literal.start()]
+        if _ends_with_role_tag(before):
+            error_offset = text[: inline_literal.start()].count("\n")
+            yield (
+                paragraph.lno + error_offset,
+                "role use a single backtick, double backtick found.",
             )
+        text = text[: inline_literal.start()] + text[inline_literal.end() :]
 
 
 @checker(".rst", ".po")
@@ -331,81 +465,70 @@ def check_role_with_extra_backtick(filename, lines, options):
     Bad:  :func:``foo`
     Good: :func:`foo`
     """
-    for lno, line in enumerate(lines, start=1):
+    for lno, line in role_lines(lines):
         for match in rst.ROLE_WITH_EXTRA_BACKTICK_RE.finditer(line):
-            yield lno, f"Extra backtick in role: {match.group(0).strip()!r}"
+            yield lno, ("Extra backtick in role: {!r}", match.group(0).strip())
 
 
-@checker(".rst", ".po")
-def check_missing_space_before_role(file, lines, options=None):
+@paragraph_checker(".rst", ".po", needs=("has_backtick", "has_colon"))
+def check_missing_space_before_role(file, paragraph, options=None):
     """Search for missing spaces before roles.
 
     Bad:  the:fct:`sum`, issue:`123`, c:func:`foo`
     Good: the :fct:`sum`, :issue:`123`, :c:func:`foo`
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        paragraph = clean_paragraph(paragraph)
-        for match in rst.ROLE_GLUED_WITH_WORD_RE.finditer(paragraph):
-            error_offset = paragraph[: match.start()].count("\n")
-            if looks_like_glued(match):
-                yield (
-                    paragraph_lno + error_offset,
-                    f"missing space before role ({match.group(0)}).",
-                )
-            else:
-                yield (
-                    paragraph_lno + error_offset,
-                    f"role missing opening tag colon ({match.group(0)}).",
-                )
+    text = paragraph.cleaned
+    for match in rst.ROLE_GLUED_WITH_WORD_RE.finditer(text, concurrent=True):
+        error_offset = text[: match.start()].count("\n")
+        if looks_like_glued(match):
+            yield (
+                paragraph.lno + error_offset,
+                ("missing space before role ({}).", match.group(0)),
+            )
+        else:
+            yield (
+                paragraph.lno + error_offset,
+                ("role missing opening tag colon ({}).", match.group(0)),
+            )
 
 
-@checker(".rst", ".po")
-def check_missing_space_before_default_role(file, lines, options=None):
+@paragraph_checker(".rst", ".po", needs=("has_backtick",))
+def check_missing_space_before_default_role(file, paragraph, options=None):
     """Search for missing spaces before default role.
 
     Bad:  the`sum`
     Good: the `sum`
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        paragraph = clean_paragraph(paragraph)
-        paragraph = rst.INTERPRETED_TEXT_RE.sub("", paragraph)
-        for role in rst.inline_markup_gen(
-            "`", "`", extra_allowed_before="[^_]"
-        ).finditer(paragraph):
-            error_offset = paragraph[: role.start()].count("\n")
-            context = paragraph[role.start() - 3 : role.end()]
-            yield (
-                paragraph_lno + error_offset,
-                f"missing space before default role: {context!r}.",
-            )
+    text = paragraph.uninterpreted
+    for role in rst.inline_markup_gen("`", "`", extra_allowed_before="[^_]").finditer(
+        text, concurrent=True
+    ):
+        error_offset = text[: role.start()].count("\n")
+        context = text[role.start() - 3 : role.end()]
+        yield (
+            paragraph.lno + error_offset,
+            ("missing space before default role: {!r}.", context),
+        )
 
 
 _HYPERLINK_REFERENCE_RE = re.compile(r"\S* <https?://[^ ]+>`_")
 
 
-@checker(".rst", ".po")
-def check_hyperlink_reference_missing_backtick(file, lines, options=None):
+@paragraph_checker(".rst", ".po", needs=("has_backtick",))
+def check_hyperlink_reference_missing_backtick(file, paragraph, options=None):
     """Search for missing backticks in front of hyperlink references.
 
     Bad:  Misc/NEWS <https://github.com/python/cpython/blob/v3.2.6/Misc/NEWS>`_
     Good: `Misc/NEWS <https://github.com/python/cpython/blob/v3.2.6/Misc/NEWS>`_
     """
-    for paragraph_lno, paragraph in paragraphs(lines):
-        if paragraph.count("|") > 4:
-            continue  # we don't handle tables yet.
-        paragraph = clean_paragraph(paragraph)
-        paragraph = rst.INTERPRETED_TEXT_RE.sub("", paragraph)
-        for hyperlink_reference in _HYPERLINK_REFERENCE_RE.finditer(paragraph):
-            error_offset = paragraph[: hyperlink_reference.start()].count("\n")
-            context = hyperlink_reference.group(0)
-            yield (
-                paragraph_lno + error_offset,
-                f"missing backtick before hyperlink reference: {context!r}.",
-            )
+    text = paragraph.uninterpreted
+    for hyperlink_reference in _HYPERLINK_REFERENCE_RE.finditer(text, concurrent=True):
+        error_offset = text[: hyperlink_reference.start()].count("\n")
+        context = hyperlink_reference.group(0)
+        yield (
+            paragraph.lno + error_offset,
+            ("missing backtick before hyperlink reference: {!r}.", context),
+        )
 
 
 @checker(".rst", ".po")
@@ -417,7 +540,10 @@ def check_missing_colon_in_role(file, lines, options=None):
     """
     for lno, line in enumerate(lines, start=1):
         for match in rst.ROLE_MISSING_RIGHT_COLON_RE.finditer(line):
-            yield lno, f"role missing colon before first backtick ({match.group(0)})."
+            yield (
+                lno,
+                ("role missing colon before first backtick ({}).", match.group(0)),
+            )
 
 
 @checker(".py", ".rst", ".po", rst_only=False)
@@ -448,6 +574,7 @@ def check_trailing_whitespace(file, lines, options=None):
 @checker(".py", ".rst", ".po", rst_only=False)
 def check_missing_final_newline(file, lines, options=None):
     """Check that the last line of the file ends with a newline."""
+    # Chunks are cut after a newline, so only the last one can lack it.
     if lines and not lines[-1].endswith("\n"):
         yield len(lines), "No newline at end of file."
 
@@ -477,7 +604,38 @@ def check_line_too_long(file, lines, options=None):
                 continue  # ignore a very long literal string
             if _is_very_long_inline_link(line):
                 continue  # ignore a very long URL on its own line
-            yield lno + 1, f"Line too long ({len(line) - 1}/{options.max_line_length})"
+            yield (
+                lno + 1,
+                (
+                    "Line too long ({}/{})",
+                    len(line) - 1,
+                    options.max_line_length,
+                ),
+            )
+
+
+class _VisibleTextParser(HTMLParser):
+    """Collect (line number, text) of the text nodes of an HTML page,
+    skipping the ones in code samples, scripts and styles."""
+
+    SKIPPED_TAGS = {"code", "pre", "script", "style", "textarea"}
+
+    def __init__(self):
+        super().__init__()
+        self.skipping = 0
+        self.texts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.texts.append((self.getpos()[0], data))
 
 
 @checker(".html", enabled=False, rst_only=False)
@@ -485,10 +643,24 @@ def check_leaked_markup(file, lines, options=None):
     """Check HTML files for leaked reST markup.
 
     This only works if the HTML files have been built.
+    Code samples, scripts and styles are not checked.
     """
-    for lno, line in enumerate(lines):
-        if rst.LEAKED_MARKUP_RE.search(line):
-            yield lno + 1, f"possibly leaked markup: {line}"
+    parser = _VisibleTextParser()
+    last_lno = 0
+    for line in chain(lines, (None,)):
+        if line is None:
+            parser.close()
+        else:
+            parser.feed(line)
+        for lno, text in parser.texts:
+            for match in rst.LEAKED_MARKUP_RE.finditer(text):
+                match_lno = lno + text.count("\n", 0, match.start())
+                if match_lno == last_lno:
+                    continue
+                last_lno = match_lno
+                context = text[max(match.start() - 30, 0) : match.end() + 30]
+                yield match_lno, ("possibly leaked markup: {!r}", context.strip())
+        parser.texts.clear()
 
 
 @checker(".rst", ".po", enabled=False)
@@ -555,7 +727,7 @@ def check_unnecessary_parentheses(filename, lines, options):
     """
     for lno, line in enumerate(lines, start=1):
         for match in rst.ROLE_WITH_UNNECESSARY_PARENTHESES_RE.finditer(line):
-            yield lno, f"Unnecessary parentheses in {match.group(0).strip()!r}"
+            yield lno, ("Unnecessary parentheses in {!r}", match.group(0).strip())
 
 
 @checker(".rst", ".po")
@@ -565,11 +737,11 @@ def check_exclamation_and_tilde(file, lines, options):
     Bad:  :meth:`!~list.pop`
     Good: :meth:`!pop`
     """
-    for lno, line in enumerate(lines, start=1):
+    for lno, line in role_lines(lines):
         if not ("~" in line and "!" in line and "`" in line):
             continue
         for match in rst.ROLE_WITH_EXCLAMATION_AND_TILDE_RE.finditer(line):
             yield (
                 lno,
-                f"Found a role with both `!` and `~` in {match.group(0).strip()!r}.",
+                ("Found a role with both `!` and `~` in {!r}.", match.group(0).strip()),
             )
@@ -1,14 +1,44 @@
 import argparse
+import dataclasses
 import enum
-import multiprocessing
+import heapq
+import json
 import os
+import pickle
 import sys
-from itertools import chain, starmap
-from operator import attrgetter
+import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from operator import attrgetter, itemgetter
 
-from sphinxlint import __version__, check_file
-from sphinxlint.checkers import all_checkers
-from sphinxlint.sphinxlint import CheckersOptions
+from sphinxlint import __version__, git
+from sphinxlint.archives import is_archive, is_readable_archive, members
+from sphinxlint.baseline import Baseline
+from sphinxlint.checkers import all_checkers, load_plugins
+from sphinxlint.diff import changed_lines
+from sphinxlint.pool import (
+    INTERPRETER_START_SECONDS,
+    THREAD_START_SECONDS,
+    InterpreterPool,
+    SupervisedPool,
+    ThreadPool,
+    available_cpus,
+    free_threaded,
+    interpreters_failure,
+    watched,
+    worker_start_seconds,
+)
+from sphinxlint.shared import Segments, SharedBatch, opened
+from sphinxlint.sphinxlint import (
+    CheckersOptions,
+    Chunk,
+    ErrorStore,
+    Linter,
+    LintError,
+)
+from sphinxlint.utils import DEFAULT_CACHE_MEMORY, cache_statistics, set_cache_memory
 
 
 class SortField(enum.Enum):
@@ -23,6 +53,42 @@ class SortField(enum.Enum):
         return ",".join(field.name.lower() for field in SortField)
 
 
+class StoreSortFieldAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        sort_fields = []
+        for field_name in values.split(","):
+            try:
+                sort_fields.append(SortField[field_name.upper()])
+            except KeyError:
+                raise ValueError(
+                    f"Unsupported sort field: {field_name}, "
+                    f"supported values are {SortField.as_supported_options()}"
+                ) from None
+        setattr(namespace, self.dest, sort_fields)
+
+
+def shard_spec(value):
+    """Parse the i/N argument of --shard."""
+    try:
+        index, count = map(int, value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"expected 1 <= i <= N, got {value!r}")
+    return index, count
+
+
+def positive_int(value):
+    """Parse the N argument of --max-errors."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected N, got {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected N >= 1, got {value!r}")
+    return number
+
+
 def parse_args(argv=None):
     """Parse command line argument."""
     if argv is None:
@@ -30,6 +96,7 @@ def parse_args(argv=None):
     parser = argparse.ArgumentParser(description=__doc__)
     parser.color = True
 
+    load_plugins()
     enabled_checkers_names = {
         checker.name for checker in all_checkers.values() if checker.enabled
     }
@@ -48,19 +115,6 @@ def parse_args(argv=None):
             else:
                 enabled_checkers_names.difference_update(values.split(","))
 
-    class StoreSortFieldAction(argparse.Action):
-        def __call__(self, parser, namespace, values, option_string=None):
-            sort_fields = []
-            for field_name in values.split(","):
-                try:
-                    sort_fields.append(SortField[field_name.upper()])
-                except KeyError:
-                    raise ValueError(
-                        f"Unsupported sort field: {field_name}, "
-                        f"supported values are {SortField.as_supported_options()}"
-                    ) from None
-            setattr(namespace, self.dest, sort_fields)
-
     class StoreNumJobsAction(argparse.Action):
         def __call__(self, parser, namespace, values, option_string=None):
             setattr(namespace, self.dest, self.job_count(values))
@@ -68,7 +122,7 @@ def parse_args(argv=None):
         @staticmethod
         def job_count(values):
             if values == "auto":
-                return os.cpu_count()
+                return available_cpus()
             return max(int(values), 1)
 
     parser.add_argument(
@@ -123,16 +177,126 @@ def parse_args(argv=None):
         help="comma-separated list of fields used to sort errors by. Available "
         f"fields are: {SortField.as_supported_options()}",
     )
+    parser.add_argument(
+        "--max-errors",
+        metavar="N",
+        type=positive_int,
+        help="Stop after finding N errors.",
+    )
+    parser.add_argument(
+        "-x",
+        "--exit-first",
+        action="store_const",
+        const=1,
+        dest="max_errors",
+        help="Stop at the first error, same as --max-errors 1.",
+    )
+    parser.add_argument(
+        "--statistics",
+        action="store_true",
+        help="Only print the number of errors per checker and per file.",
+    )
     parser.add_argument(
         "-j",
         "--jobs",
         metavar="N",
         action=StoreNumJobsAction,
-        help="Run in parallel with N processes. Defaults to 'auto', "
-        "which sets N to the number of logical CPUs. "
+        help="Run in parallel with up to N processes, fewer when there's "
+        "not enough work to pay for starting them. Defaults to 'auto', "
+        "which sets N to the number of CPUs available to sphinx-lint. "
         "Values <= 1 are all considered 1.",
         default=StoreNumJobsAction.job_count("auto"),
     )
+    git_source = parser.add_mutually_exclusive_group()
+    git_source.add_argument(
+        "--git-rev",
+        metavar="REV",
+        help="Check the files of the given git commit instead of the working "
+        "tree, without checking it out. Paths are then used as pathspecs.",
+    )
+    git_source.add_argument(
+        "--staged",
+        action="store_true",
+        help="Check the files as staged in the git index instead of the "
+        "working tree. Paths are then used as pathspecs.",
+    )
+    git_source.add_argument(
+        "--diff",
+        metavar="REF",
+        help="Only report errors on lines changed since the git ref REF, or "
+        'by the unified diff read from stdin if REF is "-". Only the paragraphs '
+        "containing changes are checked.",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="i/N",
+        type=shard_spec,
+        help="Only check the i-th of N parts of the files, parts being balanced "
+        "by file size. Use --format json and --merge to combine the reports "
+        "of all parts.",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="REPORT",
+        help="Instead of checking files, print the --format json reports of "
+        "--shard runs as a single report, sorted by filename,line unless "
+        "--sort-by is given, failing if any report holds an error.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json"],
+        default="text",
+        help="Print errors as text (the default), or as JSON objects, one per "
+        "line, on stdout.",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["process", "thread", "interpreter"],
+        help="Run the jobs in worker processes, in threads, which is faster "
+        "on free-threaded Python builds, or in subinterpreters (Python 3.14+, "
+        "falling back to processes when sphinx-lint can't run in them). Only "
+        "processes can be used with --file-timeout and --max-worker-memory. "
+        "Defaults to threads on free-threaded builds (unless these options are "
+        "given, and not benchmarked against processes yet), and to processes "
+        "otherwise.",
+    )
+    parser.add_argument(
+        "--file-timeout",
+        metavar="SECONDS",
+        type=float,
+        help="Give up on a file after SECONDS, reporting it as a file-timeout "
+        "error with the checker that was running, and continue with other files.",
+    )
+    parser.add_argument(
+        "--max-worker-memory",
+        metavar="MB",
+        type=int,
+        help="Replace workers using more than MB megabytes of memory, reporting "
+        "the file being checked as a worker-memory error.",
+    )
+    baseline = parser.add_mutually_exclusive_group()
+    baseline.add_argument(
+        "--baseline",
+        metavar="FILE",
+        help="Don't report the errors listed in FILE, as written by "
+        "--write-baseline, and report its entries no longer found.",
+    )
+    baseline.add_argument(
+        "--write-baseline",
+        metavar="FILE",
+        help="Write the errors found to FILE, instead of reporting them, "
+        "to be used with --baseline.",
+    )
+    parser.add_argument(
+        "--cache-memory",
+        metavar="MB",
+        type=int,
+        default=DEFAULT_CACHE_MEMORY // 2**20,
+        help="Memory budget, in megabytes, of the caches kept across files by "
+        "each process, defaults to %(default)s. "
+        "Use --verbose to see how well they perform.",
+    )
     parser.add_argument(
         "-V", "--version", action="version", version=f"%(prog)s {__version__}"
     )
@@ -147,52 +311,524 @@ def parse_args(argv=None):
     return enabled_checkers, args
 
 
+# Threads listing directories, getting file sizes and reading files
+# ahead: I/O bound, as many as network filesystems handle well.
+IO_THREADS = 8
+
+# Number of files read ahead of the one being checked.
+READ_AHEAD = 16
+
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+
+def io_executor():
+    """The IO_THREADS threads reading files and listing directories,
+    started on first use and kept for the life of the process, shared
+    by its worker threads, if any."""
+    global _io_executor
+    with _io_executor_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(IO_THREADS)
+        return _io_executor
+
+
+def _forget_io_executor():
+    """Threads don't survive a fork: start new ones in the child."""
+    global _io_executor, _io_executor_lock
+    _io_executor = None
+    _io_executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_io_executor)
+
+
 def walk(path, ignore_list):
-    """Wrapper around os.walk with an ignore list.
+    """Same as os.walk, with an ignore list, yielding file paths.
 
     It also allows giving a file, thus yielding just that file.
+    Directories are listed ahead in threads, so a slow filesystem
+    answers many listings at once.
     """
     if os.path.isfile(path):
         if path in ignore_list:
             return
         yield path if path[:2] != "./" else path[2:]
         return
-    for root, dirs, files in os.walk(path):
-        # ignore subdirs in ignore list
-        if any(ignore in root for ignore in ignore_list):
-            del dirs[:]
-            continue
-        for file in files:
-            file = os.path.join(root, file)
-            # ignore files in ignore list
-            if any(ignore in file for ignore in ignore_list):
+    executor = io_executor()
+    stack = []
+    try:
+        if any(ignore in path for ignore in ignore_list):
+            return
+        stack.append((path, executor.submit(_list_dir, path)))
+        while stack:
+            root, listing = stack.pop()
+            if (listing := listing.result()) is None:
                 continue
-            yield file if file[:2] != "./" else file[2:]
+            dirs, files = listing
+            for file in files:
+                file = os.path.join(root, file)
+                # ignore files in ignore list
+                if any(ignore in file for ignore in ignore_list):
+                    continue
+                yield file if file[:2] != "./" else file[2:]
+            subdirs = [os.path.join(root, name) for name in dirs]
+            stack.extend(
+                (subdir, executor.submit(_list_dir, subdir))
+                for subdir in reversed(subdirs)
+                # ignore subdirs in ignore list
+                if not any(ignore in subdir for ignore in ignore_list)
+            )
+    finally:
+        for _, listing in stack:
+            listing.cancel()
+
+
+def _list_dir(path):
+    """List the subdirectories to walk into and the files of path, as
+    os.walk does, or return None if path can't be listed."""
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry.name)
+                elif not entry.is_symlink():
+                    dirs.append(entry.name)
+    except OSError:
+        return None
+    return dirs, files
+
+
+def read_ahead(items, suffixes):
+    """Yield items, as given to Linter.lint_many, paths with one of
+    the suffixes being replaced by (path, data) pairs read in threads,
+    ahead of the one being checked.
+
+    So reading files overlaps checking them. Paths which can't be read
+    are given as is, for the Linter to tell why.
+    """
+
+    def read(item):
+        if not isinstance(item, str) or os.path.splitext(item)[1] not in suffixes:
+            return item
+        try:
+            with open(item, "rb") as file:
+                return item, file.read()
+        except OSError:
+            return item
+
+    executor = io_executor()
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(read, item))
+            if len(pending) > READ_AHEAD:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# Relative cost of checking a byte, per file suffix.
+SUFFIX_COST = {".rst": 1.0, ".po": 1.5, ".py": 0.3, ".html": 0.2}
+
+
+def estimated_cost(path, checkers):
+    """Estimate how long checking a file takes, in arbitrary units."""
+    if not isinstance(path, str):  # A (path, changed_lines) pair
+        path = path[0]
+    ext = os.path.splitext(path)[1]
+    if not any(ext in checker.suffixes for checker in checkers):
+        return 0
+    try:
+        size = os.stat(path).st_size
+    except OSError:
+        size = 0
+    return (size + 1) * SUFFIX_COST.get(ext, 1.0)
+
+
+def estimated_costs(paths, checkers):
+    """Map each path to its estimated_cost, files being stat'ed in
+    threads, as it's slow on network filesystems."""
+    step = len(paths) // (4 * IO_THREADS) + 1
+    parts = [paths[start : start + step] for start in range(0, len(paths), step)]
+    costs = io_executor().map(
+        lambda part: [estimated_cost(path, checkers) for path in part], parts
+    )
+    return dict(zip(paths, chain.from_iterable(costs)))
+
+
+# Seconds to check a unit of estimated_cost (about a byte of reST) with
+# the default checkers, measured on a laptop.
+SECONDS_PER_COST = 5e-7
+
+# Cost assumed for a file whose size is unknown before reading it.
+UNKNOWN_FILE_COST = 8192
 
+# Each worker should get at least this many times its start-up time of
+# work, else it costs more than it saves.
+MIN_WORK_PER_START = 4
 
-def _check_file(todo):
-    """Wrapper to call check_file with arguments given by
-    multiprocessing.imap_unordered."""
-    return check_file(*todo)
 
+def useful_jobs(cost, jobs, start_seconds=None):
+    """Number of workers, up to jobs, worth starting for work of the
+    given estimated cost, each taking start_seconds to start (a worker
+    process by default). 1 means checking serially is faster."""
+    if start_seconds is None:
+        start_seconds = worker_start_seconds()
+    work = cost * SECONDS_PER_COST
+    return max(1, min(jobs, int(work / (MIN_WORK_PER_START * start_seconds))))
+
+
+def in_memory_batches(contents, batch_size=2**18):
+    """Group (filename, data) pairs in batches.
+
+    Contents are read (from archives, git, ...) as the batches are
+    consumed, so only the ones being dispatched are held in memory.
+    """
+    batch, size = [], 0
+    for name, data in contents:
+        batch.append((name, data))
+        if not isinstance(data, OSError):  # See git.contents.
+            size += len(data)
+        if size >= batch_size:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+# Big files are cut in chunks of at least this many characters.
+MIN_CHUNK_SIZE = 2**16
+
+
+def schedule(
+    paths, checkers, jobs, batches_per_job=4, in_order=False, split=None, cost=None
+):
+    """Group paths in batches, costliest first, for the pool to dispatch.
+
+    This is the longest-processing-time-first heuristic: big files
+    start early instead of being left for last, while small files are
+    packed together, so no worker sits idle at the end of the run.
+
+    With in_order, batches are runs of consecutive paths instead, so
+    results can be given in the order of the paths.
+
+    If given, split(path, size) is called to cut files worth at least
+    two batches in chunks of about size characters (see
+    Linter.split_file), each chunk being a batch.
+
+    cost(path) gives the cost of a path, estimated_cost by default.
+    """
+    if cost is None:
+        costs = [(estimated_cost(path, checkers), path) for path in paths]
+    else:
+        costs = [(cost(path), path) for path in paths]
+    if not in_order:
+        costs.sort(key=itemgetter(0), reverse=True)
+    target = sum(cost for cost, _ in costs) / (jobs * batches_per_job)
+    batch, batch_cost = [], 0
+    for cost, path in costs:
+        if cost >= target:
+            if batch:
+                yield batch
+                batch, batch_cost = [], 0
+            size = max(target, MIN_CHUNK_SIZE)
+            chunks = None
+            if split is not None and isinstance(path, str) and cost >= 2 * size:
+                chunks = split(path, size)
+            yield from ([chunk] for chunk in chunks) if chunks else ([path],)
+            continue
+        batch.append(path)
+        batch_cost += cost
+        if batch_cost >= target:
+            yield batch
+            batch, batch_cost = [], 0
+    if batch:
+        yield batch
+
+
+def shard(items, index, count, cost):
+    """Return the items of the index-th (starting at 1) of count shards.
+
+    Costliest items are given first to the least loaded shard, ties
+    being broken by name and shard number, so every shard of a run
+    computes the same partition and shards finish at similar times.
+    Items are kept in their original order.
+    """
+    loads = [(0, number) for number in range(1, count + 1)]
+    mine = set()
+    for item_cost, name in sorted(
+        ((cost(item), _item_name(item)) for item in items),
+        key=lambda pair: (-pair[0], pair[1]),
+    ):
+        load, number = heapq.heappop(loads)
+        heapq.heappush(loads, (load + item_cost, number))
+        if number == index:
+            mine.add(name)
+    return [item for item in items if _item_name(item) in mine]
+
+
+def _stored(results, keep_messages=True):
+    """Store each list of errors in an ErrorStore."""
+    for errors in results:
+        store = ErrorStore(keep_messages)
+        store.extend(errors)
+        yield store
+
+
+def _check_files(todo):
+    """Wrapper to lint a batch of paths, or of (filename, data) pairs,
+    given by SupervisedPool.imap_unordered (or ThreadPool's)."""
+    (
+        items,
+        checkers,
+        options,
+        keep_messages,
+        max_errors,
+        cache_memory,
+        baseline,
+        record,
+    ) = todo
+    set_cache_memory(cache_memory)
+    linter = Linter(
+        watched(checkers),
+        options,
+        max_errors,
+        baseline=baseline,
+        record=Baseline() if record else None,
+        lazy_messages=True,
+    )
+    cache_stats = cache_statistics()
+    with opened(items) as contents:
+        (store,) = _stored(
+            [chain.from_iterable(linter.lint_many(read_ahead(contents, linter.plans)))],
+            keep_messages=keep_messages,
+        )
+    store.cache_stats = cache_statistics() - cache_stats
+    store.stale_baseline = linter.stale
+    if record:
+        store.recorded_baseline = linter.record
+    if isinstance(items, SharedBatch):  # To free once the result is back.
+        store.segment = items.segment
+    if chunk := _batch_chunk(items):  # Chunks are batches on their own.
+        store.chunk = chunk.filename, chunk.rank
+    return store
 
-def sort_errors(results, sorted_by):
-    """Flattens and potentially sorts errors based on user prefernces"""
+
+def merge_chunks(results, linter, chunked, keep_messages=True):
+    """Give the errors of each file cut in chunks (see schedule) in a
+    single store, once all its chunks are checked, see
+    Linter.merge_chunks. Other results are given as is.
+
+    chunked maps the name of the files cut in chunks to their text and
+    number of chunks.
+    """
+    pending = {}
+    for result in results:
+        if getattr(result, "chunk", None) is None:
+            yield result
+            continue
+        filename, rank = result.chunk
+        stores = pending.setdefault(filename, {})
+        stores[rank] = result
+        text, count = chunked[filename]
+        if len(stores) < count:
+            continue
+        del pending[filename], chunked[filename]
+        store = ErrorStore(keep_messages)
+        store.extend(
+            linter.merge_chunks(
+                filename,
+                text,
+                chain.from_iterable(stores[rank] for rank in sorted(stores)),
+            )
+        )
+        for chunk_store in stores.values():
+            store.cache_stats.update(chunk_store.cache_stats)
+        yield store
+
+
+def _item_name(item):
+    """Name of a path, (path, changed_lines) or (filename, data) item."""
+    return item if isinstance(item, str) else item[0]
+
+
+def _batch_names(items):
+    """Names of the files of a batch."""
+    if isinstance(items, SharedBatch):
+        return items.filenames
+    return [_item_name(item) for item in items]
+
+
+def _batch_chunk(items):
+    """The Chunk of a batch of a single chunk, or None."""
+    if isinstance(items, SharedBatch):
+        return items.chunk
+    return items[0] if isinstance(items[0], Chunk) else None
+
+
+def _failed_index(todo, running):
+    """Index, in its batch, of the file a killed worker was checking
+    (the first one if unknown)."""
+    names = _batch_names(todo[0])
+    if running is not None and running[0] in names:
+        return names.index(running[0])
+    return 0
+
+
+def _worker_failure(todo, reason, running):
+    """Build the result of the file a killed worker was checking, the
+    other files of its batch being checked again, see _worker_retry."""
+    items = todo[0]
+    names = _batch_names(items)
+    path = names[_failed_index(todo, running)]
+    checker_name = running and running[1]
+    kind = "file-timeout" if reason.startswith("timed out") else "worker-memory"
+    if reason == "crashed":
+        kind = "worker-crash"
+    during = f"while running {checker_name}" if checker_name else "before checking"
+    errors = [LintError(path, 0, f"worker {reason} {during}", kind)]
+    chunk = _batch_chunk(items)
+    if not isinstance(items, SharedBatch) and chunk is None:
+        return errors
+    store = ErrorStore()
+    store.extend(errors)
+    if isinstance(items, SharedBatch) and len(names) == 1:
+        store.segment = items.segment  # Else freed with the result of the retry.
+    if chunk is not None:  # To be merged with the other chunks.
+        store.chunk = chunk.filename, chunk.rank
+    return store
+
+
+def _worker_retry(todo, running):
+    """The batch of a killed worker without the file it was checking,
+    to be checked again (files it had already checked included, their
+    errors being lost with the worker), or None if there's no other."""
+    items = todo[0]
+    failed = _failed_index(todo, running)
+    if isinstance(items, SharedBatch):
+        if len(items.files) == 1:
+            return None
+        rest = items._replace(files=items.files[:failed] + items.files[failed + 1 :])
+    else:
+        if len(items) == 1:
+            return None
+        rest = items[:failed] + items[failed + 1 :]
+    return (rest, *todo[1:])
+
+
+# Errors sorted in memory at once, larger runs being sorted in chunks of
+# this size, spilled to temporary files, and merged.
+SORT_CHUNK_SIZE = 2**20
+
+
+def _sort_key(store, sorted_by):
+    """Key sorting the errors of the store, by their index."""
+    columns = []
+    for sort_field in sorted_by:
+        if sort_field == SortField.ERROR_TYPE:
+            names, ids = store.checker_names, store.checker_ids
+            columns.append(lambda i, names=names, ids=ids: names[ids[i]])
+        elif sort_field == SortField.FILENAME:
+            names, ids = store.filenames, store.file_ids
+            columns.append(lambda i, names=names, ids=ids: names[ids[i]])
+        elif sort_field == SortField.LINE:
+            columns.append(store.line_nos.__getitem__)
+    return lambda i: tuple(column(i) for column in columns)
+
+
+def _error_key(sorted_by):
+    """Same as _sort_key, on LintError instances."""
+    fields = {
+        SortField.ERROR_TYPE: attrgetter("checker_name"),
+        SortField.FILENAME: attrgetter("filename"),
+        SortField.LINE: lambda error: -1 if error.line_no is None else error.line_no,
+    }
+    columns = [fields[sort_field] for sort_field in sorted_by]
+    return lambda error: tuple(column(error) for column in columns)
+
+
+def _sorted(store, sorted_by):
+    """Yield the errors of the store, sorted on the sorted_by fields."""
+    for index in sorted(range(len(store.file_ids)), key=_sort_key(store, sorted_by)):
+        yield store[index]
+
+
+def _spill(errors):
+    """Write errors to a temporary file, and return an iterator on them."""
+    spill = tempfile.TemporaryFile()
+    for error in errors:
+        pickle.dump(error, spill)
+    spill.seek(0)
+
+    def load():
+        with spill:
+            while True:
+                try:
+                    yield pickle.load(spill)
+                except EOFError:
+                    return
+
+    return load()
+
+
+def sort_errors(results, sorted_by, in_order=False):
+    """Flattens and potentially sorts errors based on user prefernces.
+
+    If in_order, results are known to come file by file in filename
+    order (see schedule), so when sorting by filename first, each
+    result is sorted and given as soon as it comes. Otherwise errors
+    are sorted by all fields at once, chunks larger than
+    SORT_CHUNK_SIZE being spilled to disk until the end of the run.
+    """
     if not sorted_by:
         for results in results:
             yield from results
         return
-    errors = list(error for errors in results for error in errors)
-    # sorting is stable in python, so we can sort in reverse order to get the
-    # ordering specified by the user
-    for sort_field in reversed(sorted_by):
-        if sort_field == SortField.ERROR_TYPE:
-            errors.sort(key=lambda error: error.checker_name)
-        elif sort_field == SortField.FILENAME:
-            errors.sort(key=lambda error: error.filename)
-        elif sort_field == SortField.LINE:
-            errors.sort(key=lambda error: error.line_no)
-    yield from errors
+    if in_order and sorted_by[0] == SortField.FILENAME:
+        for errors in results:
+            store = ErrorStore()
+            store.extend(errors)
+            yield from store.failures
+            yield from _sorted(store, sorted_by)
+        return
+    failures = []
+    spilled = []
+    store = ErrorStore()
+    for errors in results:
+        store.extend(errors)
+        if len(store.file_ids) >= SORT_CHUNK_SIZE:
+            failures.extend(store.failures)
+            spilled.append(_spill(_sorted(store, sorted_by)))
+            store = ErrorStore()
+    yield from failures
+    yield from store.failures
+    yield from heapq.merge(
+        *spilled, _sorted(store, sorted_by), key=_error_key(sorted_by)
+    )
+
+
+def limit_errors(results, max_errors):
+    """Stop consuming results as soon as max_errors errors have been seen."""
+    if max_errors is None:
+        yield from results
+        return
+    remaining = max_errors
+    for errors in results:
+        errors = list(islice(errors, remaining))
+        yield errors
+        remaining -= len(errors)
+        if remaining <= 0:
+            return
 
 
 def print_errors(errors):
@@ -206,8 +842,104 @@ def print_errors(errors):
     return qty
 
 
+def print_json(errors):
+    """Print errors as JSON objects, one per line, see --merge."""
+    qty = 0
+    for error in errors:
+        if isinstance(error, str):
+            print(json.dumps({"failure": error}))
+        else:
+            print(json.dumps(dataclasses.asdict(error)))
+        qty += 1
+    return qty
+
+
+def merge(reports, sort_by):
+    """Print the --format json reports of several --shard runs as a
+    single report, see --merge."""
+    store = ErrorStore()
+    for report in reports:
+        try:
+            with open(report, encoding="utf-8") as file:
+                for line in file:
+                    error = json.loads(line)
+                    if "failure" in error:
+                        store.failures.append(error["failure"])
+                    else:
+                        store.append(**error)
+        except (OSError, ValueError, TypeError) as err:
+            print(f"Error: cannot read report {report}: {err}", file=sys.stderr)
+            return 2
+    return int(bool(print_errors(sort_errors([store], sort_by))))
+
+
+def print_unrecorded(results):
+    """Print what --write-baseline can't record: files that could not
+    be checked."""
+    qty = 0
+    for errors in results:
+        for error in errors.failures if isinstance(errors, ErrorStore) else errors:
+            print(error, file=sys.stderr)
+            qty += 1
+    return qty
+
+
+def missing_files(baseline):
+    """The entries of baseline whose file no longer exists, the members
+    of an existing archive (archive!member) being kept.
+
+    Entries of existing files not checked in this run (outside the given
+    paths, ignored, in another shard, not in the diff) are kept: they
+    can't be told stale without checking their file.
+    """
+    return baseline.subset(
+        filename
+        for filename in baseline.entries
+        if not os.path.exists(filename)
+        and not os.path.exists(filename.partition("!")[0])
+    )
+
+
+def print_cache_statistics(cache_stats):
+    """Print how well each memo cache performed, see cache_statistics."""
+    for name in sorted({name for name, _ in cache_stats}):
+        hits = cache_stats[name, "hits"]
+        misses = cache_stats[name, "misses"]
+        evictions = cache_stats[name, "evictions"]
+        ratio = hits / (hits + misses) if hits + misses else 0
+        print(
+            f"Cache {name}: {hits} hits, {misses} misses ({ratio:.1%} hits), "
+            f"{evictions} evictions",
+            file=sys.stderr,
+        )
+
+
+def print_statistics(results):
+    """Print the number of errors per checker and per file."""
+    store = ErrorStore(keep_messages=False)
+    for errors in results:
+        store.extend(errors)
+    for failure in store.failures:
+        print(failure, file=sys.stderr)
+    if not store.file_ids:
+        if not store.failures:
+            print("No problems found.")
+        return len(store)
+    per_checker, per_file = store.statistics()
+    for title, counts in ("checker", per_checker), ("file", per_file):
+        print(f"Errors per {title}:")
+        for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            print(f"{count:8} {name}")
+    print(f"{len(store.file_ids):8} errors in total")
+    return len(store)
+
+
 def main(argv=None):
+    if argv is None:
+        argv = sys.argv
     enabled_checkers, args = parse_args(argv)
+    if args.merge is not None:
+        return merge(args.merge, args.sort_by or [SortField.FILENAME, SortField.LINE])
     options = CheckersOptions.from_argparse(args)
     if args.list:
         checker_groups = (
@@ -224,31 +956,269 @@ def main(argv=None):
             print(f"{len(checkers)} {status} checker{s}:")
             for check in sorted(checkers, key=attrgetter("name")):
                 if args.verbose:
-                    print(f"- {check.name}: {check.__doc__}")
+                    print(f"- {check.name}: {check.description}")
                 else:
-                    print(f"- {check.name}: {check.__doc__.splitlines()[0]}")
+                    print(f"- {check.name}: {check.description.splitlines()[0]}")
         if not args.verbose:
             print("\n(Use `--list --verbose` to know more about each check)")
         return 0
 
-    for path in args.paths:
-        if not os.path.exists(path):
-            print(f"Error: path {path} does not exist", file=sys.stderr)
+    supervised = args.file_timeout is not None or args.max_worker_memory is not None
+    executor = args.executor
+    if executor is None:
+        # Not measured yet: threads are only assumed to beat processes on
+        # free-threaded builds, as they start faster and pickle nothing.
+        executor = "thread" if free_threaded() and not supervised else "process"
+    elif executor != "process" and supervised:
+        print(
+            "Error: --file-timeout and --max-worker-memory need the process executor",
+            file=sys.stderr,
+        )
+        return 2
+
+    baseline = None
+    if args.baseline is not None:
+        try:
+            baseline = Baseline.read(args.baseline)
+        except (OSError, ValueError) as err:
+            print(f"Error: cannot read baseline: {err}", file=sys.stderr)
             return 2
 
-    todo = [
-        (path, enabled_checkers, options)
-        for path in chain.from_iterable(walk(path, args.ignore) for path in args.paths)
-    ]
+    suffixes = {suffix for checker in enabled_checkers for suffix in checker.suffixes}
+    by_filename = bool(args.sort_by) and args.sort_by[0] == SortField.FILENAME
+    if args.git_rev is not None or args.staged:
+        try:
+            blobs = git.blobs(args.git_rev, list(args.paths), suffixes)
+        except OSError as err:
+            print(f"Error: cannot list files from git: {err}", file=sys.stderr)
+            return 2
+        blobs = [
+            (path, object_name)
+            for path, object_name in blobs
+            if not any(ignore in path for ignore in args.ignore)
+        ]
+        if args.shard:
+            # Sizes are unknown before reading blobs: balance by count.
+            blobs = shard(blobs, *args.shard, cost=lambda blob: 1)
+        if by_filename:
+            blobs.sort()
+        paths = []
+        costs = {}
+        contents = git.contents(blobs)
+        cost = len(blobs) * UNKNOWN_FILE_COST
+        in_order = by_filename
+    elif args.diff is not None:
+        try:
+            diff = sys.stdin.read() if args.diff == "-" else git.diff(args.diff)
+        except OSError as err:
+            print(f"Error: cannot get the diff: {err}", file=sys.stderr)
+            return 2
+        paths = [
+            (path, frozenset(lnos))
+            for path, lnos in changed_lines(diff).items()
+            if os.path.splitext(path)[1] in suffixes
+            and os.path.isfile(path)
+            and any(
+                os.path.commonpath([os.path.abspath(path), os.path.abspath(root)])
+                == os.path.abspath(root)
+                for root in args.paths
+            )
+            and not any(ignore in path for ignore in args.ignore)
+        ]
+        costs = estimated_costs(paths, enabled_checkers)
+        if args.shard:
+            paths = shard(paths, *args.shard, cost=costs.get)
+        if by_filename:
+            paths.sort()
+        contents = ()
+        cost = sum(costs[path] for path in paths)
+        in_order = by_filename
+    else:
+        for path in args.paths:
+            if not os.path.exists(path):
+                print(f"Error: path {path} does not exist", file=sys.stderr)
+                return 2
+        archives = [path for path in args.paths if is_archive(path)]
+        for archive in archives:
+            if not is_readable_archive(archive):
+                print(f"Error: cannot read archive {archive}", file=sys.stderr)
+                return 2
+        paths = list(
+            chain.from_iterable(
+                walk(path, args.ignore) for path in args.paths if path not in archives
+            )
+        )
+        costs = estimated_costs(paths, enabled_checkers)
+        if args.shard:
+            selected = set(
+                shard(
+                    paths + archives,
+                    *args.shard,
+                    cost=lambda path: (
+                        os.path.getsize(path) if path in archives else costs[path]
+                    ),
+                )
+            )
+            paths = [path for path in paths if path in selected]
+            archives = [archive for archive in archives if archive in selected]
+        contents = chain.from_iterable(
+            members(archive, suffixes) for archive in archives
+        )
+        cost = sum(costs[path] for path in paths) + sum(map(os.path.getsize, archives))
+        # Archive members can't be listed without reading the whole archive.
+        in_order = by_filename and not archives
+        if in_order:
+            paths.sort()
+
+    cache_stats = Counter()
+    stale = Baseline()
+    recorded = Baseline()
 
-    if args.jobs == 1 or len(todo) < 8:
-        count = print_errors(sort_errors(starmap(check_file, todo), args.sort_by))
+    def report(results):
+        if args.write_baseline is not None:
+            return print_unrecorded(results)
+        results = limit_errors(results, args.max_errors)
+        if args.statistics:
+            return print_statistics(results)
+        if args.format == "json":
+            return print_json(sort_errors(results, args.sort_by, in_order))
+        return print_errors(sort_errors(results, args.sort_by, in_order))
+
+    def counted(results):
+        for errors in results:
+            if isinstance(errors, ErrorStore):
+                cache_stats.update(errors.cache_stats)
+                stale.update(errors.stale_baseline)
+                recorded.update(errors.recorded_baseline)
+            yield errors
+
+    set_cache_memory(args.cache_memory * 2**20)
+    threaded = executor == "thread"
+    start_seconds = {
+        "thread": THREAD_START_SECONDS,
+        "interpreter": INTERPRETER_START_SECONDS,
+    }.get(executor)
+    jobs = useful_jobs(cost, args.jobs, start_seconds)
+    if not supervised and jobs == 1:
+        backend = "serial"
+        linter = Linter(
+            enabled_checkers,
+            options,
+            args.max_errors,
+            baseline=baseline,
+            record=recorded if args.write_baseline is not None else None,
+            lazy_messages=True,
+        )
+        results = _stored(
+            linter.lint_many(chain(read_ahead(paths, linter.plans), contents)),
+            keep_messages=not args.statistics,
+        )
+        initial_cache_stats = cache_statistics()
+        count = report(results)
+        cache_stats = cache_statistics() - initial_cache_stats
+        stale = linter.stale
     else:
-        with multiprocessing.Pool(processes=args.jobs) as pool:
-            count = print_errors(
-                sort_errors(pool.imap_unordered(_check_file, todo), args.sort_by)
+        if executor == "interpreter" and (failure := interpreters_failure()):
+            print(
+                f"Warning: can't check files in subinterpreters ({failure}), "
+                "using processes instead.",
+                file=sys.stderr,
+            )
+            executor = "process"
+        backend = f"{jobs} {executor}{'es' if executor == 'process' else 's'}"
+        # Big files are cut in chunks, checked in parallel, then merged.
+        merger = Linter(
+            enabled_checkers,
+            options,
+            args.max_errors,
+            baseline=baseline,
+            record=recorded if args.write_baseline is not None else None,
+            lazy_messages=True,
+        )
+        chunked = {}
+
+        def split(path, size):
+            if (split_file := merger.split_file(path, size)) is None:
+                return None
+            text, chunks = split_file
+            chunked[path] = text, len(chunks)
+            return chunks
+
+        batches = schedule(
+            paths,
+            enabled_checkers,
+            jobs,
+            # Smaller batches so a killed worker takes fewer files down.
+            batches_per_job=32 if supervised else 4,
+            in_order=in_order,
+            split=split if jobs > 1 else None,
+            cost=costs.get,
+        )
+        batches = chain(batches, in_memory_batches(contents))
+        # Worker processes read in-memory contents from shared memory.
+        segments = Segments()
+        share = segments.share if executor == "process" else lambda batch: batch
+        todo = (
+            (
+                share(batch),
+                enabled_checkers,
+                options,
+                not args.statistics,
+                args.max_errors,
+                args.cache_memory * 2**20,
+                baseline and baseline.subset(map(_item_name, batch)),
+                args.write_baseline is not None,
             )
-            pool.close()
-            pool.join()
+            for batch in batches
+        )
+        if threaded:
+            pool = ThreadPool(jobs, _check_files)
+        elif executor == "interpreter":
+            pool = InterpreterPool(jobs, _check_files)
+        else:
+            pool = SupervisedPool(
+                jobs,
+                _check_files,
+                _worker_failure,
+                timeout=args.file_timeout,
+                max_memory=args.max_worker_memory and args.max_worker_memory * 2**20,
+                retry=_worker_retry,
+            )
+        initial_cache_stats = cache_statistics()
+        with segments, pool:
+            imap = pool.imap if in_order else pool.imap_unordered
+            results = merge_chunks(
+                segments.released(imap(todo)),
+                merger,
+                chunked,
+                keep_messages=not args.statistics,
+            )
+            count = report(counted(results))
+        stale.update(merger.stale)
+        if threaded:
+            # Threads share the memo caches, so the statistics of each
+            # batch also count the lookups of the batches run meanwhile.
+            cache_stats = cache_statistics() - initial_cache_stats
 
+    if args.verbose:
+        print(f"Checked with: {backend}", file=sys.stderr)
+        print_cache_statistics(cache_stats)
+    # Reported once across shards, and git revisions may have other files.
+    first_shard = args.shard is None or args.shard[0] == 1
+    if baseline is not None and args.git_rev is None and first_shard:
+        stale.update(missing_files(baseline))
+    for filename, checker_name, fp in stale:
+        print(
+            f"{filename}: baseline entry {fp:016x} ({checker_name}) "
+            "no longer matches any error",
+            file=sys.stderr,
+        )
+    if args.write_baseline is not None:
+        try:
+            recorded.write(args.write_baseline)
+        except OSError as err:
+            print(f"Error: cannot write baseline: {err}", file=sys.stderr)
+            return 2
+        print(f"Baseline of {len(recorded)} errors written to {args.write_baseline}.")
+        return 0
     return int(bool(count))
@@ -0,0 +1,45 @@
+"""Find out which lines a unified diff changes."""
+
+import regex as re
+
+_HUNK_HEADER_RE = re.compile(r"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def changed_lines(diff):
+    """Return a {filename: set of line numbers} mapping of the lines
+    added or modified by the given unified diff, in the new files.
+
+    Where lines are only removed, the lines around the removal are
+    considered changed, as joining them may introduce errors.
+    """
+    changes = {}
+    current = None
+    old_left = new_left = lno = 0
+    for line in diff.splitlines():
+        if old_left or new_left:
+            if line.startswith("+"):
+                current.add(lno)
+                lno += 1
+                new_left -= 1
+            elif line.startswith("-"):
+                old_left -= 1
+            elif not line.startswith("\\"):
+                lno += 1
+                old_left -= 1
+                new_left -= 1
+            continue
+        if line.startswith("+++ "):
+            filename = line[4:].split("\t")[0]
+            if filename == "/dev/null":
+                current = None
+                continue
+            if filename.startswith("b/"):
+                filename = filename[2:]
+            current = changes.setdefault(filename, set())
+        elif current is not None and (match := _HUNK_HEADER_RE.match(line)):
+            old_left = int(match[1] or 1)
+            lno = int(match[2])
+            new_left = int(match[3] or 1)
+            if not new_left:  # Lines removed after line `lno`.
+                current.update({lno, lno + 1} - {0})
+    return changes
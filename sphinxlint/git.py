@@ -0,0 +1,73 @@
+"""Read files to lint from a git commit or the index, without a checkout."""
+
+import subprocess
+from os.path import splitext
+
+
+def _git(*args):
+    """Run git, raising OSError with its error message if it fails."""
+    process = subprocess.run(["git", *args], capture_output=True)
+    if process.returncode:
+        raise OSError(process.stderr.decode("utf-8", "replace").strip())
+    return process.stdout.decode("utf-8", "surrogateescape")
+
+
+def blobs(rev=None, paths=(), suffixes=()):
+    """Return (path, object name) pairs of the files of a commit, or of
+    the index if rev is None, restricted to the given paths and suffixes.
+    """
+    found = []
+    if rev is None:
+        # <mode> SP <object> SP <stage> TAB <file>
+        entries = _git("ls-files", "--stage", "-z", "--", *paths).split("\0")
+    else:
+        # <mode> SP <type> SP <object> TAB <file>
+        entries = _git("ls-tree", "-r", "-z", rev, "--", *paths).split("\0")
+    for entry in entries:
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        mode, *fields = info.split()
+        if mode != "100644" and mode != "100755":
+            continue  # symlinks, submodules
+        if rev is None:
+            object_name, stage = fields
+            if stage != "0":
+                continue  # unmerged
+        else:
+            object_name = fields[1]
+        if splitext(path)[1] in suffixes:
+            found.append((path, object_name))
+    return found
+
+
+def contents(blobs):
+    """Yield (path, data) for each of the (path, object name) pairs.
+
+    All blobs are read through a single `git cat-file --batch` process.
+    For a blob which can't be read (as when it's gone since blobs was
+    called), data is the OSError telling why, see Linter.lint_many.
+    """
+    with subprocess.Popen(
+        ["git", "cat-file", "--batch"], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    ) as cat_file:
+        try:
+            for path, object_name in blobs:
+                cat_file.stdin.write(object_name.encode("ascii") + b"\n")
+                cat_file.stdin.flush()
+                header = cat_file.stdout.readline().split()
+                if len(header) != 3:  # <object> missing
+                    yield path, OSError(f"git cat-file: no object {object_name}")
+                    continue
+                data = cat_file.stdout.read(int(header[2]))
+                cat_file.stdout.read(1)  # Trailing newline
+                yield path, data
+        finally:
+            cat_file.stdin.close()
+
+
+def diff(rev, paths=()):
+    """Return the diff between rev and the working tree, as a text."""
+    return _git(
+        "diff", "--no-color", "--no-ext-diff", "--relative", "-U0", rev, "--", *paths
+    )
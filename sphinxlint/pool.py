@@ -0,0 +1,500 @@
+"""A process pool supervising its workers.
+
+Unlike multiprocessing.Pool, each worker gets one task at a time, so
+the supervisor always knows which task a worker is busy with, can kill
+a worker stuck on it (or using too much memory), and starts a fresh
+worker to finish the run.
+"""
+
+import functools
+import gc
+import importlib
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from itertools import islice
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from concurrent.futures import InterpreterPoolExecutor
+except ImportError:  # Python < 3.14
+    InterpreterPoolExecutor = None
+
+# Set in worker processes: shared buffer holding the file being checked
+# and the running checker name, separated by a null byte.
+_status = None
+
+
+# Seconds to start a worker, per start method, measured on a laptop:
+# forked workers are ready at once, spawned ones import sphinxlint
+# first, and the forkserver imports it once (see worker_context).
+WORKER_START_SECONDS = {"fork": 0.005, "forkserver": 0.05, "spawn": 0.25}
+
+
+# Modules imported once by the forkserver, workers being forked from it.
+PRELOADED_MODULES = ["sphinxlint.cli"]
+
+
+def worker_context(method=None):
+    """The multiprocessing context to start workers with, using the given
+    start method (the platform default if None).
+
+    With forkserver (the default on Linux since Python 3.14), the server
+    imports sphinxlint, so its patterns are compiled once, and not in
+    each worker.
+    """
+    context = multiprocessing.get_context(method)
+    if context.get_start_method() == "forkserver":
+        context.set_forkserver_preload(PRELOADED_MODULES)
+    return context
+
+
+def worker_start_seconds(context=None):
+    """Estimated time to start a worker with the given context."""
+    method = (context or multiprocessing.get_context()).get_start_method()
+    return WORKER_START_SECONDS.get(method, 0.25)
+
+
+# Seconds to start a thread of a ThreadPool, and an interpreter of an
+# InterpreterPool (which imports sphinxlint).
+THREAD_START_SECONDS = 0.0001
+INTERPRETER_START_SECONDS = 0.05
+
+
+def free_threaded():
+    """Whether Python runs without the GIL, so threads run in parallel."""
+    return not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def _preload():
+    for module in PRELOADED_MODULES:
+        importlib.import_module(module)
+
+
+def interpreters_failure():
+    """Why sphinxlint can't run in subinterpreters, or None if it can.
+
+    Extension modules not supporting subinterpreters (maybe regex)
+    refuse to be imported in them.
+    """
+    if InterpreterPoolExecutor is None:
+        return "subinterpreters need Python 3.14 or later"
+    try:
+        with InterpreterPoolExecutor(1) as executor:
+            executor.submit(_preload).result()
+    except Exception as err:  # Raised in the interpreter, of any type.
+        return str(err) or type(err).__name__
+    return None
+
+
+def available_cpus():
+    """Number of CPUs this process can use.
+
+    Unlike os.cpu_count(), this honors the CPU affinity of the process,
+    and the CPU quota of its cgroup (as set for containers).
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+def cgroup_cpu_quota(root="/sys/fs/cgroup", proc_cgroup="/proc/self/cgroup"):
+    """CPU quota of the cgroup of the process, in CPUs, or None if
+    unlimited or unknown. Both cgroup v2 and v1 are handled."""
+    try:
+        with open(proc_cgroup, encoding="utf-8") as file:
+            cgroups = [line.rstrip("\n").split(":", 2) for line in file]
+    except OSError:
+        cgroups = []
+    for _, controllers, path in cgroups:
+        if controllers == "":  # cgroup v2
+            for directory in f"{root}{path}".rstrip("/"), root:
+                quota = _read_quota(f"{directory}/cpu.max")
+                if quota != ():
+                    return quota
+        elif "cpu" in controllers.split(","):  # cgroup v1
+            for directory in f"{root}/{controllers}{path}", f"{root}/{controllers}":
+                quota = _read_quota(
+                    f"{directory}/cpu.cfs_quota_us", f"{directory}/cpu.cfs_period_us"
+                )
+                if quota != ():
+                    return quota
+    return None
+
+
+def _read_quota(*paths):
+    """Read a quota as a number of CPUs from either one cgroup v2 file
+    (containing "quota period") or two v1 files (one number each).
+
+    Returns None when unlimited, () when the files can't be read.
+    """
+    try:
+        fields = []
+        for path in paths:
+            with open(path, encoding="utf-8") as file:
+                fields.extend(file.read().split())
+        quota, period = fields
+        if quota in ("max", "-1"):
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError, ZeroDivisionError):
+        return ()
+
+
+def _peak_memory():
+    """Peak resident set size of the current process, in bytes."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def _current_memory(pid):
+    """Resident set size of the given process in bytes, 0 if unknown."""
+    try:
+        with open(f"/proc/{pid}/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+def watched(checkers):
+    """Wrap checkers so the supervisor can tell which one is running.
+
+    Outside of a supervised worker, checkers are returned untouched.
+    """
+    if _status is None:
+        return checkers
+    return {_watch(check) for check in checkers}
+
+
+@functools.cache
+def _watch(check):
+    @functools.wraps(check)
+    def watched_check(file, lines, options=None):
+        status = f"{file}\0{check.name}".encode("utf-8", "replace")
+        _status.value = status[: len(_status) - 1]
+        yield from check(file, lines, options)
+
+    if hasattr(check, "per_paragraph"):
+        # The Linter calls it directly, see checkers.paragraph_checker.
+        per_paragraph = check.per_paragraph
+        status = {}
+
+        def watched_paragraph(file, paragraph, options=None):
+            if file not in status:
+                status.clear()
+                status[file] = f"{file}\0{check.name}".encode("utf-8", "replace")
+            _status.value = status[file][: len(_status) - 1]
+            return per_paragraph(file, paragraph, options)
+
+        watched_check.per_paragraph = watched_paragraph
+    return watched_check
+
+
+def _work(conn, status, func, max_memory):
+    """Worker main loop: run func on each received task."""
+    global _status
+    _status = status
+    # Garbage collections won't touch the objects the worker starts with
+    # (inherited or imported), so their memory pages stay shared with
+    # the parent (or forkserver) instead of being copied.
+    gc.freeze()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        status.value = b""
+        result = func(task)
+        retiring = bool(max_memory) and _peak_memory() > max_memory
+        conn.send((result, retiring))
+        if retiring:
+            return
+
+
+class _Worker:
+    def __init__(self, ctx, func, max_memory):
+        self.status = ctx.Array("c", 1024, lock=False)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_work,
+            args=(child_conn, self.status, func, max_memory),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.index = None
+        self.started = None
+        self.file = None
+
+    def submit(self, task):
+        self.task = task
+        self.started = time.monotonic()
+        self.file = None
+        self.conn.send(task)
+
+    def elapsed(self, now):
+        """Time spent on the current file of the task."""
+        running = self.running()
+        if running is not None and running[0] != self.file:
+            self.file = running[0]
+            self.started = now
+        return now - self.started
+
+    def running(self):
+        """(filename, checker_name) being run, or None."""
+        # Written as file\0checker\0, so .value would stop at the file.
+        filename, _, rest = self.status.raw.partition(b"\0")
+        if not filename:
+            return None
+        checker_name = rest.partition(b"\0")[0]
+        return (
+            filename.decode("utf-8", "replace"),
+            checker_name.decode("utf-8", "replace"),
+        )
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class _Pool:
+    """imap and imap_unordered, for pools giving (task index, results)
+    pairs in completion order from _imap(tasks), results being the
+    list of the results of the task (more than one when the task was
+    cut after a failure, see SupervisedPool)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.terminate()
+
+    def imap_unordered(self, tasks):
+        """Yield func(task) for each task, in completion order."""
+        for _, results in self._imap(tasks):
+            yield from results
+
+    def imap(self, tasks):
+        """Yield func(task) for each task, in the order of the tasks.
+
+        Results completed early are held until the results of all the
+        previous tasks have been given.
+        """
+        pending = {}
+        next_index = 0
+        for index, results in self._imap(tasks):
+            pending[index] = results
+            while next_index in pending:
+                yield from pending.pop(next_index)
+                next_index += 1
+
+
+class ThreadPool(_Pool):
+    """Run func(task) for each task in threads.
+
+    On free-threaded Python builds, threads check files in parallel
+    without starting processes, nor pickling tasks and results. Threads
+    can't be killed though: there's no timeout nor memory limit.
+    """
+
+    executor_class = ThreadPoolExecutor
+
+    def __init__(self, threads, func):
+        self.threads = max(threads, 1)
+        self.func = func
+        self.executor = self.executor_class(self.threads)
+
+    def terminate(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def _imap(self, tasks):
+        """Yield (task index, [func(task)]) pairs, in completion order,
+        submitting at most two tasks per thread ahead."""
+        tasks = enumerate(tasks)
+        pending = {}
+
+        def submit(count):
+            for index, task in islice(tasks, count):
+                pending[self.executor.submit(self.func, task)] = index
+
+        submit(2 * self.threads)
+        while pending:
+            done, _ = wait_futures(pending, return_when=FIRST_COMPLETED)
+            submit(len(done))
+            for future in done:
+                yield pending.pop(future), [future.result()]
+
+
+class InterpreterPool(ThreadPool):
+    """Run func(task) for each task in subinterpreters (Python 3.14+).
+
+    Each interpreter has its own GIL, so they run in parallel like
+    processes, but start faster and use less memory. Tasks and results
+    are still pickled, and func must be importable. As with threads,
+    there's no timeout nor memory limit. See interpreters_failure.
+    """
+
+    executor_class = InterpreterPoolExecutor
+
+
+class SupervisedPool(_Pool):
+    """Run func(task) for each task in worker processes.
+
+    When a worker spends more than `timeout` seconds on a single task
+    (or a single file of a task),
+    or its memory grows over `max_memory` bytes, it is killed and
+    replaced, and `on_failure(task, reason, running)` is used as the
+    result of the task, `running` being the (filename, checker_name)
+    pair the worker was busy with, if known.
+
+    If given, `retry(task, running)` gives the part of a failed task
+    still to be run (as the other files of a batch), or None. It is run
+    again by another worker, and its results are given with the result
+    of the failure.
+    """
+
+    poll_interval = 0.1
+
+    def __init__(
+        self,
+        processes,
+        func,
+        on_failure,
+        timeout=None,
+        max_memory=None,
+        context=None,
+        retry=None,
+    ):
+        self.processes = max(processes, 1)
+        self.func = func
+        self.on_failure = on_failure
+        self.retry = retry
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.ctx = context or worker_context()
+        self.workers = []
+
+    def terminate(self):
+        for worker in self.workers:
+            if worker.task is None:
+                worker.stop()
+            else:
+                worker.kill()
+        self.workers = []
+
+    def _spawn(self):
+        worker = _Worker(self.ctx, self.func, self.max_memory)
+        self.workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        self.workers.remove(worker)
+        return self._spawn()
+
+    def _imap(self, tasks):
+        """Yield (task index, results) pairs, in completion order."""
+        tasks = enumerate(tasks)
+        while len(self.workers) < self.processes:
+            self._spawn()
+        busy = {}
+        retries = deque()
+        gathered = {}  # Results of the failed parts of tasks being retried.
+
+        def feed(worker):
+            # Retries first: the replacement of a failed worker runs them.
+            item = retries.popleft() if retries else next(tasks, None)
+            if item is not None:
+                worker.index, task = item
+                worker.submit(task)
+                busy[worker.conn] = worker
+
+        def done(worker, result):
+            return worker.index, gathered.pop(worker.index, []) + [result]
+
+        def failed(worker, reason):
+            """Kill the worker, give the (index, results) of its task if
+            it's not retried."""
+            running = worker.running()
+            result = self.on_failure(worker.task, reason, running)
+            rest = self.retry and self.retry(worker.task, running)
+            worker.kill()
+            if rest is None:
+                return done(worker, result)
+            gathered.setdefault(worker.index, []).append(result)
+            retries.append((worker.index, rest))
+            return None
+
+        for worker in list(self.workers):
+            feed(worker)
+        watching = self.timeout is not None or self.max_memory is not None
+        while busy:
+            ready = wait(
+                list(busy) + [worker.process.sentinel for worker in busy.values()],
+                timeout=self.poll_interval if watching else None,
+            )
+            for conn, worker in list(busy.items()):
+                if conn not in ready and worker.process.sentinel not in ready:
+                    continue
+                del busy[conn]
+                try:
+                    result, retiring = conn.recv()
+                except (EOFError, OSError):
+                    if (results := failed(worker, "crashed")) is not None:
+                        yield results
+                    feed(self._replace(worker))
+                    continue
+                worker.task = None
+                yield done(worker, result)
+                if retiring:
+                    worker.stop()
+                    worker = self._replace(worker)
+                feed(worker)
+            if not watching:
+                continue
+            now = time.monotonic()
+            for conn, worker in list(busy.items()):
+                if self.timeout is not None and worker.elapsed(now) > self.timeout:
+                    reason = f"timed out after {self.timeout:g}s"
+                elif (
+                    self.max_memory is not None
+                    and _current_memory(worker.process.pid) > self.max_memory
+                ):
+                    reason = f"exceeded {self.max_memory // 2**20} MB of memory"
+                else:
+                    continue
+                del busy[conn]
+                if (results := failed(worker, reason)) is not None:
+                    yield results
+                feed(self._replace(worker))
@@ -0,0 +1,143 @@
+"""Pass file contents to worker processes through shared memory.
+
+Contents read by the parent (archive members, git objects, texts given
+to the asyncio API) would otherwise be pickled in each task, copied
+through a pipe, and unpickled by the worker. Instead, they are copied
+once in a shared memory segment, and only the name of the segment and
+the offsets of the files are sent, workers decoding them in place.
+"""
+
+import sys
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple
+
+from sphinxlint.sphinxlint import Chunk
+
+# Smaller contents are cheaper to pickle than to share.
+MIN_SHARED_SIZE = 2**16
+
+
+def share_tracker():
+    """Start the resource tracker of this process, so worker processes
+    started afterwards share it.
+
+    Before Python 3.13, workers register the segments they attach to in
+    the resource tracker. With a tracker of their own, it would warn
+    about (and unlink) the segments still registered when they exit.
+    """
+    if sys.version_info < (3, 13):
+        resource_tracker.ensure_running()
+
+
+class SharedBatch(NamedTuple):
+    """A batch of (filename, data) pairs, the data being in the shared
+    memory segment named `segment`, between the offsets given in
+    `files`, as (filename, start, end) triples.
+
+    For a batch of a single Chunk, `chunk` is the Chunk, without its
+    text, which is the data.
+    """
+
+    segment: str
+    files: tuple
+    chunk: Chunk = None
+
+    @property
+    def filenames(self):
+        return [filename for filename, _, _ in self.files]
+
+
+class Segments:
+    """Shared memory segments of the batches being checked.
+
+    The segment of a batch is freed when its result comes back (see
+    released), the remaining ones when leaving the with block.
+    """
+
+    def __init__(self, min_size=MIN_SHARED_SIZE):
+        self.min_size = min_size
+        self.segments = {}
+        share_tracker()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for name in list(self.segments):
+            self.free(name)
+
+    def share(self, batch):
+        """Copy the data of a batch of (filename, data) pairs, or the
+        text of a batch of a single Chunk, in a new segment, giving the
+        SharedBatch to send instead.
+
+        Other batches, and small ones, are given as is.
+        """
+        if len(batch) == 1 and isinstance(batch[0], Chunk):
+            (chunk,) = batch
+            if len(chunk.text) < self.min_size:
+                return batch
+            shared = self._copy([(chunk.filename, chunk.text.encode("utf-8"))])
+            return shared._replace(chunk=chunk._replace(text=None))
+        if not all(
+            isinstance(item, tuple) and isinstance(item[1], bytes) for item in batch
+        ):
+            return batch
+        if sum(len(data) for _, data in batch) < self.min_size:
+            return batch
+        return self._copy(batch)
+
+    def _copy(self, batch):
+        size = sum(len(data) for _, data in batch)
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        self.segments[segment.name] = segment
+        files = []
+        start = 0
+        for filename, data in batch:
+            end = start + len(data)
+            segment.buf[start:end] = data
+            files.append((filename, start, end))
+            start = end
+        return SharedBatch(segment.name, tuple(files))
+
+    def free(self, name):
+        segment = self.segments.pop(name, None)
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+
+    def released(self, results):
+        """Free the segment of each result (see ErrorStore.segment) as it
+        comes back."""
+        for result in results:
+            if getattr(result, "segment", None) is not None:
+                self.free(result.segment)
+            yield result
+
+
+@contextmanager
+def opened(batch):
+    """Give the (filename, data) pairs of a SharedBatch, data being
+    memoryviews of the segment, valid until leaving the with block (or
+    its Chunk, its text being such a memoryview).
+
+    Other batches are given as is.
+    """
+    if not isinstance(batch, SharedBatch):
+        yield batch
+        return
+    if sys.version_info >= (3, 13):
+        segment = shared_memory.SharedMemory(name=batch.segment, track=False)
+    else:  # Registered in the tracker of the parent, see share_tracker.
+        segment = shared_memory.SharedMemory(name=batch.segment)
+    views = [segment.buf[start:end] for _, start, end in batch.files]
+    try:
+        if batch.chunk is not None:
+            yield [batch.chunk._replace(text=views[0])]
+        else:
+            yield list(zip(batch.filenames, views))
+    finally:
+        for view in views:
+            view.release()
+        segment.close()
@@ -1,8 +1,22 @@
+from array import array
 from collections import Counter
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from operator import attrgetter
 from os.path import splitext
+from typing import NamedTuple
 
-from sphinxlint.utils import PER_FILE_CACHES, hide_non_rst_blocks, po2rst
+from sphinxlint.baseline import Baseline, fingerprint
+from sphinxlint.utils import (
+    PER_FILE_CACHES,
+    Lines,
+    hide_non_rst_blocks,
+    keep_paragraphs,
+    paragraph_features,
+    po2rst,
+    split_points,
+)
 
 
 @dataclass(frozen=True)
@@ -18,6 +32,145 @@ class LintError:
         return f"{self.filename}:{self.line_no}: {self.msg} ({self.checker_name})"
 
 
+def format_message(msg):
+    """Format a message as given by a checker: either a string, or a
+    (format, *args) tuple."""
+    if isinstance(msg, str):
+        return msg
+    return msg[0].format(*msg[1:])
+
+
+class Chunk(NamedTuple):
+    """Lines of filename, after its first offset lines, see Linter.split_file.
+
+    A whole_file chunk holds the whole text, for the whole_file checkers.
+    The text is given UTF-8 encoded (bytes or a memoryview) when sent
+    through shared memory, see sphinxlint.shared.
+    """
+
+    filename: str
+    offset: int
+    text: str | bytes | memoryview
+    whole_file: bool = False
+
+    @property
+    def rank(self):
+        """Rank of the chunk among the chunks of its file."""
+        return -1 if self.whole_file else self.offset
+
+
+class ErrorStore:
+    """A compact, column-wise, list of errors.
+
+    Filenames and checker names are stored once, each error being a
+    file id, a line number, a checker id, and (unless keep_messages is
+    False, when only counting errors) its message, as given by the
+    checker. LintError instances are only built, and their messages
+    formatted (see format_message), when iterating.
+
+    Errors given as strings (files that could not be read) are kept
+    aside, in `failures`. The memo caches statistics of the worker which
+    found the errors can be given in `cache_stats`, see cache_statistics,
+    the stale and recorded baselines of its Linter in `stale_baseline`
+    and `recorded_baseline`, the (filename, offset) of the Chunk the
+    errors were found in, if any, in `chunk`, and the name of the shared
+    memory segment the files were read from, if any, in `segment`.
+    """
+
+    def __init__(self, keep_messages=True):
+        self.keep_messages = keep_messages
+        self.filenames = []
+        self.checker_names = []
+        self._file_ids = {}
+        self._checker_ids = {}
+        self.file_ids = array("I")
+        self.line_nos = array("i")  # -1 stands for None.
+        self.checker_ids = array("H")
+        self.messages = []
+        self.failures = []
+        self.cache_stats = Counter()
+        self.stale_baseline = Baseline()
+        self.recorded_baseline = Baseline()
+        self.chunk = None
+        self.segment = None
+
+    def _file_id(self, filename):
+        try:
+            return self._file_ids[filename]
+        except KeyError:
+            self.filenames.append(filename)
+            return self._file_ids.setdefault(filename, len(self.filenames) - 1)
+
+    def _checker_id(self, checker_name):
+        try:
+            return self._checker_ids[checker_name]
+        except KeyError:
+            self.checker_names.append(checker_name)
+            return self._checker_ids.setdefault(
+                checker_name, len(self.checker_names) - 1
+            )
+
+    def append(self, filename, line_no, msg, checker_name):
+        self.file_ids.append(self._file_id(filename))
+        self.line_nos.append(-1 if line_no is None else line_no)
+        self.checker_ids.append(self._checker_id(checker_name))
+        if self.keep_messages:
+            self.messages.append(msg)
+
+    def extend(self, errors):
+        """Add errors, from a list of LintError (or strings) or another store."""
+        if isinstance(errors, ErrorStore):
+            file_ids = [self._file_id(filename) for filename in errors.filenames]
+            checker_ids = [self._checker_id(name) for name in errors.checker_names]
+            self.file_ids.extend(file_ids[file_id] for file_id in errors.file_ids)
+            self.line_nos.extend(errors.line_nos)
+            self.checker_ids.extend(
+                checker_ids[checker_id] for checker_id in errors.checker_ids
+            )
+            if self.keep_messages:
+                self.messages.extend(errors.messages)
+            self.failures.extend(errors.failures)
+            self.cache_stats.update(errors.cache_stats)
+            self.stale_baseline.update(errors.stale_baseline)
+            self.recorded_baseline.update(errors.recorded_baseline)
+            return
+        for error in errors:
+            if isinstance(error, str):
+                self.failures.append(error)
+            else:
+                self.append(
+                    error.filename, error.line_no, error.msg, error.checker_name
+                )
+
+    def __len__(self):
+        return len(self.file_ids) + len(self.failures)
+
+    def __getitem__(self, index):
+        """The index-th LintError (failures are not indexed)."""
+        line_no = self.line_nos[index]
+        return LintError(
+            self.filenames[self.file_ids[index]],
+            None if line_no == -1 else line_no,
+            format_message(self.messages[index]) if self.keep_messages else "",
+            self.checker_names[self.checker_ids[index]],
+        )
+
+    def __iter__(self):
+        yield from self.failures
+        for index in range(len(self.file_ids)):
+            yield self[index]
+
+    def statistics(self):
+        """Return the number of errors per checker and per file."""
+        per_checker = Counter()
+        per_file = Counter()
+        for checker_id, count in Counter(self.checker_ids).items():
+            per_checker[self.checker_names[checker_id]] = count
+        for file_id, count in Counter(self.file_ids).items():
+            per_file[self.filenames[file_id]] = count
+        return per_checker, per_file
+
+
 class CheckersOptions:
     """Configuration options for checkers."""
 
@@ -30,40 +183,351 @@ class CheckersOptions:
         return options
 
 
-def check_text(filename, text, checkers, options=None):
-    if options is None:
-        options = CheckersOptions()
-    errors = []
-    ext = splitext(filename)[1]
-    checkers = {checker for checker in checkers if ext in checker.suffixes}
-    lines = tuple(text.splitlines(keepends=True))
-    if any(checker.rst_only for checker in checkers):
-        lines_with_rst_only = hide_non_rst_blocks(lines)
-    for check in checkers:
-        if ext not in check.suffixes:
-            continue
-        for lno, msg in check(
-            filename, lines_with_rst_only if check.rst_only else lines, options
-        ):
-            errors.append(LintError(filename, lno, msg, check.name))
-    return errors
+class _ParagraphCheckers:
+    """Paragraph checkers (see checkers.paragraph_checker), run in a
+    single walk over the paragraphs, each paragraph being given only to
+    the checkers needing the features it has.
+    """
 
+    def __init__(self, checkers):
+        self.checkers = frozenset(checkers)
+        by_needs = {}
+        for check in sorted(self.checkers, key=attrgetter("name")):
+            by_needs.setdefault(check.needs, []).append(check)
+        self.groups = tuple(
+            (needs, tuple(checks)) for needs, checks in by_needs.items()
+        )
 
-def check_file(filename, checkers, options: CheckersOptions = None):
-    try:
-        ext = splitext(filename)[1]
-        if not any(ext in checker.suffixes for checker in checkers):
-            return Counter()
+    def __call__(self, file, lines, options):
+        """Return the (lno, msg) pairs found by each checker, by checker."""
+        errors = {check: [] for check in self.checkers}
+        for paragraph in paragraph_features(lines):
+            if paragraph.is_table:
+                continue  # we don't handle tables yet.
+            for needs, checks in self.groups:
+                if all(getattr(paragraph, flag) for flag in needs):
+                    for check in checks:
+                        errors[check].extend(
+                            check.per_paragraph(file, paragraph, options)
+                        )
+        return errors
+
+
+class Linter:
+    """Lint texts and files with a given set of checkers.
+
+    The checkers to run on each file suffix are computed once, so a
+    Linter can be reused across many calls (and threads) cheaply.
+    Checkers run cheapest first, see their cost, paragraph checkers
+    all running at the rank of the cheapest of them, while their errors
+    are still given at their own rank.
+
+    If max_errors is given, checking a file stops as soon as that many
+    errors are found in it. Paragraph checkers then run on their own,
+    as their shared walk runs them all on the whole file before the
+    first error is given.
+
+    If a baseline is given, the errors it holds are not reported, and
+    the entries of a fully checked file not matching any error anymore
+    are added to the `stale` baseline. If a `record` baseline is given,
+    the reported errors are added to it.
+
+    With lazy_messages, the messages of the errors are given as yielded
+    by the checkers, to be formatted only if printed (see ErrorStore).
+    """
+
+    def __init__(
+        self,
+        checkers,
+        options=None,
+        max_errors=None,
+        baseline=None,
+        record=None,
+        lazy_messages=False,
+    ):
+        if options is None:
+            options = CheckersOptions()
+        self.checkers = frozenset(checkers)
+        self.options = options
+        self.max_errors = max_errors
+        self.baseline = baseline
+        self.stale = Baseline()
+        self.record = record
+        self.lazy_messages = lazy_messages
+        self.plans = {}
+        for suffix in {suffix for check in self.checkers for suffix in check.suffixes}:
+            self.plans[suffix] = tuple(
+                sorted(
+                    (check for check in self.checkers if suffix in check.suffixes),
+                    key=attrgetter("cost", "name"),
+                )
+            )
+        self.paragraph_checkers = {
+            suffix: _ParagraphCheckers(
+                check
+                for check in plan
+                if hasattr(check, "per_paragraph")
+                and check.rst_only
+                and max_errors is None
+            )
+            for suffix, plan in self.plans.items()
+        }
+
+    def iter_text(self, filename, text, changed_lines=None):
+        """Yield the errors found in text, as they are found.
+
+        If changed_lines (a set of line numbers) is given, only errors
+        on those lines are reported, and reST checkers only look at
+        the paragraphs containing them.
+        """
+        plan = self.plans.get(splitext(filename)[1], ())
+        if not plan:
+            return
+        lines = Lines(text)
+        try:
+            yield from self._reported(
+                filename,
+                lines,
+                plan,
+                self._found(filename, lines, plan, changed_lines),
+                changed_lines,
+            )
+        finally:
+            # The per-file caches are keyed by lines, don't keep them.
+            for memoized_function in PER_FILE_CACHES:
+                memoized_function.cache_clear()
+
+    def _found(self, filename, lines, plan, changed_lines=None):
+        """Yield (checker, errors) pairs, errors being the (lno, msg)
+        pairs found by each checker of the plan, in order."""
+        lines_with_rst_only = None
+        paragraph_checkers = self.paragraph_checkers[splitext(filename)[1]]
+        paragraph_errors = None
+        for check in plan:
+            if check.rst_only and lines_with_rst_only is None:
+                lines_with_rst_only = hide_non_rst_blocks(lines)
+                if changed_lines is not None:
+                    lines_with_rst_only = keep_paragraphs(
+                        lines_with_rst_only, changed_lines
+                    )
+            if check in paragraph_checkers.checkers:
+                if paragraph_errors is None:
+                    paragraph_errors = paragraph_checkers(
+                        filename, lines_with_rst_only, self.options
+                    )
+                yield check, paragraph_errors[check]
+            else:
+                yield (
+                    check,
+                    check(
+                        filename,
+                        lines_with_rst_only if check.rst_only else lines,
+                        self.options,
+                    ),
+                )
+
+    def _reported(
+        self, filename, lines, plan, found, changed_lines=None, complete=True
+    ):
+        """Yield the LintError to report from (checker, errors) pairs,
+        see _found, once the baseline is applied, the entries not found
+        being stale if all the errors of the file are given (complete)."""
+        accepted = Counter()
+        if self.baseline is not None:
+            accepted = self.baseline.accepted(filename)
+        for check, errors in found:
+            for lno, msg in errors:
+                if changed_lines is not None and lno not in changed_lines:
+                    continue
+                if accepted or self.record is not None:
+                    line = lines[lno - 1] if lno and 0 < lno <= len(lines) else ""
+                    fp = fingerprint(check.name, filename, line)
+                    if accepted[check.name, fp] > 0:
+                        accepted[check.name, fp] -= 1
+                        continue
+                    if self.record is not None:
+                        self.record.add(filename, check.name, fp)
+                yield self._error(filename, lno, msg, check.name)
+        if accepted and changed_lines is None and complete:
+            names = {check.name for check in plan}
+            for (checker_name, fp), count in accepted.items():
+                if count > 0 and checker_name in names:
+                    self.stale.add(filename, checker_name, fp, count)
+
+    def _error(self, filename, lno, msg, checker_name):
+        if not self.lazy_messages:
+            msg = format_message(msg)
+        return LintError(filename, lno, msg, checker_name)
+
+    def split_file(self, filename, size):
+        """Read filename and cut it in Chunk instances of about size
+        characters, to be checked in parallel (see lint_chunk) and
+        merged (see merge_chunks).
+
+        Only reST and po files are cut, in at least two chunks, else
+        (or if the file can't be read, for lint_file to report it) None
+        is returned. Else the text (the po2rst text for a po file) and
+        its chunks are returned, starting with a whole_file chunk if
+        whole_file checkers are to be run on it.
+        """
+        suffix = splitext(filename)[1]
+        if suffix not in (".rst", ".po") or suffix not in self.plans:
+            return None
         try:
             with open(filename, encoding="utf-8") as f:
                 text = f.read()
-            if filename.endswith(".po"):
-                text = po2rst(text)
-        except OSError as err:
-            return [f"{filename}: cannot open: {err}"]
-        except UnicodeDecodeError as err:
-            return [f"{filename}: cannot decode as UTF-8: {err}"]
-        return check_text(filename, text, checkers, options)
-    finally:
-        for memoized_function in PER_FILE_CACHES:
-            memoized_function.cache_clear()
+        except (OSError, UnicodeDecodeError):
+            return None
+        if suffix == ".po":
+            text = po2rst(text)
+        lines = Lines(text)
+        points = split_points(lines, size)
+        if not points:
+            return None
+        bounds = [0, *points, len(lines)]
+        chunks = [
+            Chunk(filename, start, "".join(lines[start:end]))
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        if any(check.whole_file for check in self.plans[suffix]):
+            chunks.insert(0, Chunk(filename, 0, text, whole_file=True))
+        return text, chunks
+
+    def lint_chunk(self, chunk):
+        """Return the list of errors found in a chunk of a file (see
+        split_file), with line numbers in the file, only whole_file
+        checkers being run on a whole_file chunk, and only the others on
+        other chunks. The baseline and max_errors are applied by
+        merge_chunks, as the first errors of a chunk may be in the
+        baseline."""
+        plan = tuple(
+            check
+            for check in self.plans.get(splitext(chunk.filename)[1], ())
+            if check.whole_file == chunk.whole_file
+        )
+        text = chunk.text
+        if not isinstance(text, str):
+            text = str(text, "utf-8")
+        try:
+            errors = (
+                self._error(chunk.filename, lno + chunk.offset, msg, check.name)
+                for check, found in self._found(chunk.filename, Lines(text), plan)
+                for lno, msg in found
+            )
+            return list(errors)
+        finally:
+            for memoized_function in PER_FILE_CACHES:
+                memoized_function.cache_clear()
+
+    def merge_chunks(self, filename, text, errors):
+        """Return the list of errors of filename, its text being cut in
+        chunks, from the errors found in them in order (see lint_chunk).
+
+        The errors are the same, in the same order, as lint_text would
+        give. Errors given by other checkers than the ones linting
+        filename (like failures to check a chunk) are kept, first, and
+        the baseline entries of the file are then not told stale, as the
+        errors of the failed chunks are unknown.
+        """
+        plan = self.plans.get(splitext(filename)[1], ())
+        found = {check: [] for check in plan}
+        by_name = {check.name: pairs for check, pairs in found.items()}
+        others = []
+        for error in errors:
+            if error.checker_name in by_name:
+                by_name[error.checker_name].append((error.line_no, error.msg))
+            else:
+                others.append(error)
+        lines = Lines(text)
+        try:
+            errors = self._reported(
+                filename, lines, plan, found.items(), complete=not others
+            )
+            return others + list(islice(errors, self.max_errors))
+        finally:
+            for memoized_function in PER_FILE_CACHES:
+                memoized_function.cache_clear()
+
+    def lint_text(self, filename, text, changed_lines=None):
+        """Return the list of errors found in text, see iter_text."""
+        errors = self.iter_text(filename, text, changed_lines)
+        try:
+            return list(islice(errors, self.max_errors))
+        finally:
+            errors.close()  # Even when stopping at max_errors.
+
+    def lint_file(self, filename, changed_lines=None):
+        """Read filename and return the list of errors found in it.
+
+        See lint_text for changed_lines.
+        """
+        if splitext(filename)[1] not in self.plans:
+            return []
+        try:
+            try:
+                with open(filename, encoding="utf-8") as f:
+                    text = f.read()
+            except OSError as err:
+                return [f"{filename}: cannot open: {err}"]
+            except UnicodeDecodeError as err:
+                return [f"{filename}: cannot decode as UTF-8: {err}"]
+            return self._lint_contents(filename, text, changed_lines)
+        finally:
+            for memoized_function in PER_FILE_CACHES:
+                memoized_function.cache_clear()
+
+    def lint_bytes(self, filename, data):
+        """Return the list of errors found in data (bytes or a
+        memoryview), the UTF-8 encoded content of filename (which is not
+        read)."""
+        if splitext(filename)[1] not in self.plans:
+            return []
+        try:
+            try:
+                text = str(data, "utf-8")
+            except UnicodeDecodeError as err:
+                return [f"{filename}: cannot decode as UTF-8: {err}"]
+            # Same newline translation as open() does for text files.
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+            return self._lint_contents(filename, text)
+        finally:
+            for memoized_function in PER_FILE_CACHES:
+                memoized_function.cache_clear()
+
+    def _lint_contents(self, filename, text, changed_lines=None):
+        if filename.endswith(".po"):
+            text = po2rst(text)
+        return self.lint_text(filename, text, changed_lines)
+
+    def lint_many(self, items):
+        """Lint each item, yielding the list of errors of each one.
+
+        Items are either file names, (filename, data) pairs as
+        accepted by lint_bytes, (filename, OSError) pairs for contents
+        which could not be read, (filename, changed_lines) pairs as
+        accepted by lint_file, or Chunk instances.
+        """
+        for item in items:
+            if isinstance(item, str):
+                yield self.lint_file(item)
+            elif isinstance(item, Chunk):
+                yield self.lint_chunk(item)
+            elif isinstance(item[1], OSError):
+                yield [f"{item[0]}: cannot read: {item[1]}"]
+            elif isinstance(item[1], (bytes, memoryview)):
+                yield self.lint_bytes(*item)
+            else:
+                yield self.lint_file(*item)
+
+
+@lru_cache(maxsize=16)
+def _linter(checkers, options):
+    return Linter(checkers, options)
+
+
+def check_text(filename, text, checkers, options=None):
+    return _linter(frozenset(checkers), options).lint_text(filename, text)
+
+
+def check_file(filename, checkers, options: CheckersOptions = None):
+    return _linter(frozenset(checkers), options).lint_file(filename)
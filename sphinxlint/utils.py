@@ -1,6 +1,12 @@
 """Just a bunch of utility functions for sphinxlint."""
 
-from functools import lru_cache
+import sys
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from functools import update_wrapper
+from itertools import accumulate, islice
 
 import regex as re
 from polib import pofile
@@ -10,12 +16,217 @@ from sphinxlint import rst
 PER_FILE_CACHES = []
 
 
+class PerFileCache:
+    """Memoize a function for the file being checked, until cache_clear
+    is called, once the file is checked.
+
+    Each thread has its own cache, so threads can check files at once.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.local = threading.local()
+        update_wrapper(self, func)
+
+    def __call__(self, *args):
+        try:
+            data = self.local.data
+        except AttributeError:
+            data = self.local.data = {}
+        try:
+            return data[args]
+        except KeyError:
+            result = data[args] = self.func(*args)
+            return result
+
+    def cache_clear(self):
+        self.local.data = {}
+
+
 def per_file_cache(func):
-    memoized_func = lru_cache(maxsize=None)(func)
+    memoized_func = PerFileCache(func)
     PER_FILE_CACHES.append(memoized_func)
     return memoized_func
 
 
+MEMO_CACHES = []
+
+
+class MemoCache:
+    """Memoize a single argument function, across files.
+
+    The least recently used results are evicted so the cache stays
+    under max_size bytes (as measured by sys.getsizeof on arguments and
+    results), hits, misses and evictions being counted. It's shared by
+    threads, a lock keeping it consistent.
+    """
+
+    def __init__(self, func, max_size):
+        self.func = func
+        self.max_size = max_size
+        self.size = 0
+        self.data = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+        self.__wrapped__ = func
+
+    def __call__(self, arg):
+        data = self.data
+        with self.lock:
+            if arg in data:
+                self.hits += 1
+                data.move_to_end(arg)
+                return data[arg]
+            self.misses += 1
+        result = self.func(arg)
+        with self.lock:
+            if arg in data:  # Computed by another thread meanwhile.
+                return result
+            data[arg] = result
+            self.size += sys.getsizeof(arg) + sys.getsizeof(result)
+            while self.size > self.max_size and data:
+                old_arg, old_result = data.popitem(last=False)
+                self.size -= sys.getsizeof(old_arg) + sys.getsizeof(old_result)
+                self.evictions += 1
+        return result
+
+    def cache_clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+
+DEFAULT_CACHE_MEMORY = 64 * 2**20
+_cache_memory = DEFAULT_CACHE_MEMORY
+
+
+def memo_cache(func):
+    memoized_func = MemoCache(func, 0)
+    MEMO_CACHES.append(memoized_func)
+    set_cache_memory(_cache_memory)
+    return memoized_func
+
+
+def set_cache_memory(size):
+    """Share a budget of size bytes among the memo caches."""
+    global _cache_memory
+    _cache_memory = size
+    for memoized_func in MEMO_CACHES:
+        memoized_func.max_size = size // len(MEMO_CACHES)
+
+
+def cache_statistics():
+    """Return the memo caches hits, misses, and evictions, as a Counter
+    keyed by (function name, event) pairs."""
+    return Counter({
+        (memoized_func.__name__, event): getattr(memoized_func, event)
+        for memoized_func in MEMO_CACHES
+        for event in ("hits", "misses", "evictions")
+    })
+
+
+class Lines(Sequence):
+    """The lines of a text, as `text.splitlines(keepends=True)` would give.
+
+    The text is stored once, with an array of line offsets, lines
+    being sliced on demand. Lines can be hidden: they then read as
+    empty lines, so line numbering still makes sense. Hiding lines
+    gives a new Lines sharing the same text and offsets.
+    """
+
+    __slots__ = ("text", "offsets", "hidden", "_spans")
+
+    def __init__(self, text, offsets=None, hidden=None):
+        self.text = text
+        if offsets is None:
+            # The lines are only alive while their lengths are summed.
+            offsets = array(
+                "I" if len(text) < 2**32 else "Q",
+                accumulate(map(len, text.splitlines(keepends=True)), initial=0),
+            )
+        self.offsets = offsets
+        self.hidden = hidden  # A bitmap, or None if no line is hidden.
+        self._spans = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _is_hidden(self, index):
+        return self.hidden is not None and self.hidden[index >> 3] & (1 << (index & 7))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        if self._is_hidden(index):
+            return "\n"
+        return self.text[self.offsets[index] : self.offsets[index + 1]]
+
+    def __iter__(self):
+        if self.hidden is None:
+            starts, stops = self.offsets, islice(self.offsets, 1, None)
+        else:
+            if self._spans is None:
+                self._spans = self._hidden_spans()
+            if not self._spans:
+                return (self[index] for index in range(len(self)))
+            starts, stops = self._spans
+        # Slicing from C code, this is as fast as iterating over a tuple.
+        return map(self.text.__getitem__, map(slice, starts, stops))
+
+    def _hidden_spans(self):
+        """Return (starts, stops) line offsets, hidden lines spanning a
+        newline of the text so they read as "\\n" (or () if there's none).
+        """
+        text = self.text
+        newline = text.find("\n")
+        starts = self.offsets[:-1]
+        stops = self.offsets[1:]
+        for byte_index, byte in enumerate(self.hidden):
+            for bit in range(8) if byte else ():
+                index = byte_index * 8 + bit
+                if byte & (1 << bit) and index < len(starts):
+                    if newline == -1:
+                        return ()
+                    starts[index], stops[index] = newline, newline + 1
+        return starts, stops
+
+    def hide(self, indices):
+        """Return the same lines, with the given (0-based) ones hidden."""
+        if not indices:
+            return self
+        hidden = bytearray(self.hidden or (len(self) + 7) // 8)
+        for index in indices:
+            hidden[index >> 3] |= 1 << (index & 7)
+        return Lines(self.text, self.offsets, hidden)
+
+    def join(self, start, stop):
+        """Same as "".join(self[start:stop]), without copying each line."""
+        if self.hidden is None or not any(
+            self.hidden[index >> 3] & (1 << (index & 7)) for index in range(start, stop)
+        ):
+            return self.text[self.offsets[start] : self.offsets[stop]]
+        return "".join(self[start:stop])
+
+
+def _hide(lines, indices):
+    """Hide the given (0-based) lines, replacing them by empty lines."""
+    if isinstance(lines, Lines):
+        return lines.hide(indices)
+    return tuple("\n" if index in indices else line for index, line in enumerate(lines))
+
+
+def _join(lines, start, stop):
+    if isinstance(lines, Lines):
+        return lines.join(start, stop)
+    return "".join(lines[start:stop])
+
+
 def match_size(re_match):
     return re_match.end() - re_match.start()
 
@@ -38,7 +249,7 @@ def _clean_heuristic(paragraph, regex):
         paragraph = paragraph[: candidate.start()] + paragraph[candidate.end() :]
 
 
-@per_file_cache
+@memo_cache
 def clean_paragraph(paragraph):
     """Removes all good constructs, so detectors can focus on bad ones.
 
@@ -54,7 +265,7 @@ def clean_paragraph(paragraph):
     return paragraph.replace("\x00", "\\")
 
 
-@per_file_cache
+@memo_cache
 def escape2null(text):
     r"""Return a string with escape-backslashes converted to nulls.
 
@@ -94,22 +305,135 @@ def paragraphs(lines):
     paragraphs of the given lines.
     """
     output = []
-    paragraph = []
-    paragraph_lno = 1
+    paragraph_lno = None
     for lno, line in enumerate(lines, start=1):
         if line != "\n":
-            if not paragraph:
+            if paragraph_lno is None:
                 # save the lno of the first line of the para
                 paragraph_lno = lno
-            paragraph.append(line)
-        elif paragraph:
-            output.append((paragraph_lno, "".join(paragraph)))
-            paragraph = []
-    if paragraph:
-        output.append((paragraph_lno, "".join(paragraph)))
+        elif paragraph_lno is not None:
+            output.append((paragraph_lno, _join(lines, paragraph_lno - 1, lno - 1)))
+            paragraph_lno = None
+    if paragraph_lno is not None:
+        output.append((paragraph_lno, _join(lines, paragraph_lno - 1, len(lines))))
     return tuple(output)
 
 
+class Paragraph:
+    """A paragraph, with the features paragraph checkers filter on.
+
+    Features are computed once per paragraph, and the cleaned and
+    escaped texts on first use, whatever the number of checkers.
+    """
+
+    __slots__ = (
+        "lno",
+        "text",
+        "is_table",
+        "has_backtick",
+        "has_colon",
+        "_cleaned",
+        "_uninterpreted",
+    )
+
+    def __init__(self, lno, text):
+        self.lno = lno
+        self.text = text
+        self.is_table = text.count("|") > 4
+        self.has_backtick = "`" in text
+        self.has_colon = ":" in text
+        self._cleaned = self._uninterpreted = None
+
+    @property
+    def cleaned(self):
+        """The text, see clean_paragraph."""
+        if self._cleaned is None:
+            self._cleaned = clean_paragraph(self.text)
+        return self._cleaned
+
+    @property
+    def uninterpreted(self):
+        """The cleaned text, without its interpreted text."""
+        if self._uninterpreted is None:
+            self._uninterpreted = rst.INTERPRETED_TEXT_RE.sub(
+                "", self.cleaned, concurrent=True
+            )
+        return self._uninterpreted
+
+    @property
+    def escaped(self):
+        """The text, see escape2null."""
+        return escape2null(self.text)
+
+
+@per_file_cache
+def paragraph_features(lines):
+    """Same as paragraphs, as Paragraph instances."""
+    return tuple(Paragraph(lno, text) for lno, text in paragraphs(lines))
+
+
+@per_file_cache
+def hyperlinks(lines):
+    """The (lno, match) pairs of what seems to be hyperlinks (see
+    rst.SEEMS_HYPERLINK_RE), found once for all the hyperlink checkers."""
+    return tuple(
+        (lno, match)
+        for lno, line in enumerate(lines, start=1)
+        if "`" in line
+        for match in rst.SEEMS_HYPERLINK_RE.finditer(line, concurrent=True)
+    )
+
+
+@per_file_cache
+def role_lines(lines):
+    """The (lno, line) pairs of the lines having a role (see
+    rst.ROLE_HEAD), found once for all the role checkers."""
+    return tuple(
+        (lno, line)
+        for lno, line in enumerate(lines, start=1)
+        if ":" in line and rst.ROLE_HEAD_RE.search(line)
+    )
+
+
+def split_points(lines, size):
+    """Indexes of the lines to cut lines at, in parts of about size
+    characters, each part giving the same errors once checked on its own.
+
+    Parts start with a line at column 0 after an empty line, as neither
+    paragraphs nor hidden blocks (see hide_non_rst_blocks) span over it.
+    """
+    points = []
+    length = 0
+    after_empty_line = False
+    for index, line in enumerate(lines):
+        if length >= size and after_empty_line and line[:1] not in ("", " ", "\n"):
+            points.append(index)
+            length = 0
+        length += len(line)
+        after_empty_line = line == "\n"
+    return points
+
+
+def keep_paragraphs(lines, lnos):
+    """Replace by empty lines the paragraphs not containing any of the
+    given line numbers, so line numbering still makes sense.
+    """
+    hidden = set()
+    paragraph_start = 0
+    keep = False
+    for lno, line in enumerate(lines, start=1):
+        if line == "\n":
+            if not keep:
+                hidden.update(range(paragraph_start, lno - 1))
+            paragraph_start = lno
+            keep = False
+        elif lno in lnos:
+            keep = True
+    if not keep:
+        hidden.update(range(paragraph_start, len(lines)))
+    return _hide(lines, hidden)
+
+
 def looks_like_glued(match):
     """Tell appart glued tags and tags with a missing colon.
 
@@ -171,28 +495,27 @@ def hide_non_rst_blocks(lines, hidden_block_cb=None):
     in_literal = None
     excluded_lines = []
     block_line_start = None
-    output = []
+    hidden = set()
     for lineno, line in enumerate(lines, start=1):
         if in_literal is not None:
             current_indentation = len(_ZERO_OR_MORE_SPACES_RE.match(line)[0])
             if current_indentation > in_literal or line == "\n":
                 excluded_lines.append(line if line == "\n" else line[in_literal:])
-                line = "\n"  # Hiding line
-            else:
-                in_literal = None
-                if hidden_block_cb:
-                    hidden_block_cb(block_line_start, "".join(excluded_lines))
-                excluded_lines = []
-        if in_literal is None and is_multiline_non_rst_block(line):
+                hidden.add(lineno - 1)
+                continue
+            in_literal = None
+            if hidden_block_cb:
+                hidden_block_cb(block_line_start, "".join(excluded_lines))
+            excluded_lines = []
+        if is_multiline_non_rst_block(line):
             in_literal = len(_ZERO_OR_MORE_SPACES_RE.match(line)[0])
             block_line_start = lineno
             assert not excluded_lines
             if type_of_explicit_markup(line) == "comment" and _COMMENT_RE.search(line):
-                line = "\n"
-        output.append(line)
+                hidden.add(lineno - 1)
     if excluded_lines and hidden_block_cb:
         hidden_block_cb(block_line_start, "".join(excluded_lines))
-    return tuple(output)
+    return _hide(lines, hidden)
 
 
 _starts_with_directive_marker = re.compile(rf"\.\. {rst.ALL_DIRECTIVES}::").match
@@ -202,7 +525,7 @@ _starts_with_target = re.compile(r"\.\. _.*[^_]: ").match
 _starts_with_substitution_definition = re.compile(r"\.\. \|[^\|]*\| ").match
 
 
-@per_file_cache
+@memo_cache
 def type_of_explicit_markup(line):
     """Tell apart various explicit markup blocks."""
     line = line.lstrip()
@@ -0,0 +1,79 @@
+import asyncio
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sphinxlint import aio, alint_file, alint_paths, alint_text, check_text
+from sphinxlint.checkers import all_checkers
+
+TEXT = "A :func:`role\n"
+
+
+@pytest.fixture(params=["process", "thread"])
+def executor(request):
+    if request.param == "thread":
+        aio.set_executor(ThreadPoolExecutor(2))
+    yield
+    aio.shutdown()
+
+
+def test_alint_text(executor):
+    checkers = all_checkers.values()
+    errors = asyncio.run(alint_text("a.rst", TEXT, checkers))
+    assert errors == check_text("a.rst", TEXT, checkers)
+
+
+def test_alint_big_text(executor):
+    text = "Some text with a :func:`role\n\nand trailing whitespace \n" * 2000
+    checkers = all_checkers.values()
+    errors = asyncio.run(alint_text("a.rst", text, checkers))
+    assert errors == check_text("a.rst", text, checkers)
+
+
+def test_alint_paths(executor, tmp_path):
+    for i in range(5):
+        (tmp_path / f"{i}.rst").write_text(TEXT, encoding="utf-8")
+    (tmp_path / "ignored.txt").write_text(TEXT, encoding="utf-8")
+
+    async def lint():
+        return [error async for error in alint_paths([tmp_path], all_checkers.values())]
+
+    errors = asyncio.run(lint())
+    assert sorted(error.filename for error in errors) == [
+        str(tmp_path / f"{i}.rst") for i in range(5)
+    ]
+    errors = asyncio.run(alint_file(str(tmp_path / "0.rst"), all_checkers.values()))
+    assert len(errors) == 1
+
+
+def test_alint_paths_stops_early(executor, tmp_path):
+    for i in range(50):
+        (tmp_path / f"{i}.rst").write_text(TEXT, encoding="utf-8")
+
+    async def first_error():
+        errors = alint_paths([tmp_path], all_checkers.values(), max_pending=2)
+        async for error in errors:
+            await errors.aclose()
+            return error
+
+    assert asyncio.run(first_error()).checker_name == "missing-backtick-after-role"
+
+
+def test_alint_paths_batches_small_files(tmp_path):
+    for i in range(5):
+        (tmp_path / f"{i}.rst").write_text(TEXT, encoding="utf-8")
+    files = [str(tmp_path / f"{i}.rst") for i in range(5)]
+    assert list(aio._batches(files)) == [files]
+    assert list(aio._batches(files, batch_size=2 * len(TEXT))) == [
+        files[0:2],
+        files[2:4],
+        files[4:],
+    ]
+
+
+def test_cli_does_not_import_asyncio():
+    code = "import sys, sphinxlint.cli; print('asyncio' in sys.modules)"
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output == "False\n"
@@ -0,0 +1,78 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from sphinxlint import cli
+from sphinxlint.cli import main
+from sphinxlint.shared import Segments
+
+BAD = b"Some text with a :func:`role\n\nand trailing whitespace \n"
+
+
+def make_zip(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("docs/bad.rst", BAD)
+        archive.writestr("docs/ignored.txt", BAD)
+
+
+def make_tar(path):
+    with tarfile.open(path, "w:gz") as archive:
+        for name in "docs/bad.rst", "docs/ignored.txt":
+            info = tarfile.TarInfo(name)
+            info.size = len(BAD)
+            archive.addfile(info, io.BytesIO(BAD))
+
+
+@pytest.mark.parametrize(
+    "name,make", [("docs.zip", make_zip), ("docs.tar.gz", make_tar)]
+)
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_lint_archive_members(tmp_path, capsys, monkeypatch, name, make, jobs):
+    monkeypatch.setattr(cli, "worker_start_seconds", lambda: 1e-9)
+    archive = tmp_path / name
+    make(archive)
+    has_errors = main(["sphinxlint", "-j", jobs, str(archive)])
+    out, err = capsys.readouterr()
+    assert has_errors
+    assert f"{archive}!docs/bad.rst:1: role missing closing backtick" in err
+    assert f"{archive}!docs/bad.rst:3: trailing whitespace" in err
+    assert "ignored.txt" not in err
+
+
+def test_unreadable_archive(tmp_path, capsys):
+    archive = tmp_path / "docs.zip"
+    archive.write_text("not a zip", encoding="UTF-8")
+    assert main(["sphinxlint", str(archive)]) == 2
+    assert "cannot read archive" in capsys.readouterr().err
+
+
+def test_big_archive_members_go_through_shared_memory(tmp_path, capsys, monkeypatch):
+    archive = tmp_path / "docs.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        for i in range(200):
+            zip_file.writestr(f"docs/{i}.rst", BAD * 40)
+    main(["sphinxlint", "-j", "1", str(archive)])
+    sequential = capsys.readouterr().err
+    shared, freed = [], []
+    share, free = Segments.share, Segments.free
+
+    def spied_share(self, batch):
+        shared.append(share(self, batch))
+        return shared[-1]
+
+    def spied_free(self, name):
+        freed.append(name)
+        free(self, name)
+
+    monkeypatch.setattr(Segments, "share", spied_share)
+    monkeypatch.setattr(Segments, "free", spied_free)
+    monkeypatch.setattr(cli, "worker_start_seconds", lambda: 1e-9)
+    main(["sphinxlint", "-j", "2", "--executor", "process", str(archive)])
+    assert sorted(capsys.readouterr().err.splitlines()) == sorted(
+        sequential.splitlines()
+    )
+    segments = [batch.segment for batch in shared if hasattr(batch, "segment")]
+    assert segments
+    assert sorted(freed) == sorted(segments)
@@ -0,0 +1,71 @@
+import pytest
+
+from sphinxlint import Linter, cli
+from sphinxlint.baseline import Baseline, fingerprint
+from sphinxlint.checkers import all_checkers
+from sphinxlint.cli import main
+
+TEXT = "A :func:`role\n\nOK.\n"
+
+
+def test_fingerprint_ignores_whitespace_changes():
+    assert fingerprint("c", "a.rst", "  a  :func:`b\n") == fingerprint(
+        "c", "a.rst", "a :func:`b"
+    )
+    assert fingerprint("c", "a.rst", "a") != fingerprint("c", "b.rst", "a")
+
+
+def test_baseline_survives_moved_lines():
+    record = Baseline()
+    errors = Linter(all_checkers.values(), record=record).lint_text("a.rst", TEXT)
+    assert len(errors) == len(record) == 1
+    linter = Linter(all_checkers.values(), baseline=record)
+    assert linter.lint_text("a.rst", "New\n\n" + TEXT) == []
+    assert len(linter.lint_text("a.rst", TEXT + "\n" + TEXT)) == 1
+    assert not linter.stale
+    assert linter.lint_text("a.rst", "OK.\n") == []
+    assert len(linter.stale) == 1
+
+
+def test_baseline_file(tmp_path):
+    baseline = Baseline()
+    baseline.add("a b.rst", "default-role", 42)
+    baseline.add("a b.rst", "default-role", 42)
+    baseline.write(tmp_path / "baseline")
+    assert list(Baseline.read(tmp_path / "baseline")) == list(baseline)
+    (tmp_path / "bad").write_text("nope\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        Baseline.read(tmp_path / "bad")
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_baseline_cli(jobs, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cli, "worker_start_seconds", lambda: 1e-9)
+    for i in range(10):
+        (tmp_path / f"{i}.rst").write_text(TEXT, encoding="utf-8")
+    assert main(["sphinx-lint", "-j", jobs, "--write-baseline", "baseline", "."]) == 0
+    assert "Baseline of 10 errors" in capsys.readouterr().out
+    assert main(["sphinx-lint", "-j", jobs, "--baseline", "baseline", "."]) == 0
+    (tmp_path / "0.rst").write_text("A :func:`new\n", encoding="utf-8")
+    assert main(["sphinx-lint", "-j", jobs, "--baseline", "baseline", "."]) == 1
+    err = capsys.readouterr().err
+    assert "0.rst:1: role missing closing backtick: ':func:`new" in err
+    assert "0.rst: baseline entry" in err
+
+
+def test_baseline_entries_of_missing_files(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "docs").mkdir()
+    for name in "docs/a.rst", "docs/b.rst", "c.rst":
+        (tmp_path / name).write_text(TEXT, encoding="utf-8")
+    assert main(["sphinx-lint", "--write-baseline", "baseline", "."]) == 0
+    (tmp_path / "docs" / "a.rst").unlink()
+    assert main(["sphinx-lint", "--baseline", "baseline", "docs"]) == 0
+    err = capsys.readouterr().err
+    assert "docs/a.rst: baseline entry" in err
+    # Not checked, but still there: can't be told stale.
+    assert "c.rst" not in err
+    assert "docs/b.rst" not in err
+    assert main(["sphinx-lint", "--baseline", "baseline", "--shard", "2/2", "."]) == 0
+    assert "docs/a.rst" not in capsys.readouterr().err
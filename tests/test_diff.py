@@ -0,0 +1,36 @@
+from sphinxlint import Linter
+from sphinxlint.checkers import all_checkers
+from sphinxlint.diff import changed_lines
+
+DIFF = """\
+diff --git a/doc.rst b/doc.rst
+--- a/doc.rst
++++ b/doc.rst
+@@ -1,0 +2,2 @@
++added
++lines
+@@ -5,2 +6,0 @@
+-removed
+-lines
+@@ -9 +9 @@
+-modified
++line
+--- a/removed.rst
++++ /dev/null
+@@ -1 +0,0 @@
+-gone
+"""
+
+
+def test_changed_lines():
+    assert changed_lines(DIFF) == {"doc.rst": {2, 3, 6, 7, 9}}
+
+
+def test_lint_changed_lines_only():
+    text = "A :func:`role\n\nwith error\n\n:func:`another\nrole\n"
+    linter = Linter(all_checkers.values())
+    assert {error.line_no for error in linter.lint_text("a.rst", text)} == {1, 5}
+    errors = linter.lint_text("a.rst", text, changed_lines={6})
+    assert [error.line_no for error in errors] == []
+    errors = linter.lint_text("a.rst", text, changed_lines={5, 6})
+    assert [error.line_no for error in errors] == [5]
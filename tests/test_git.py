@@ -0,0 +1,76 @@
+import shutil
+import subprocess
+
+import pytest
+
+from sphinxlint import cli, git
+from sphinxlint.cli import main
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def git(*args):
+        subprocess.run(["git", *args], check=True, capture_output=True)
+
+    git("init", "-q")
+    git("config", "user.email", "sphinx-lint@example.com")
+    git("config", "user.name", "sphinx-lint")
+    (tmp_path / "doc.rst").write_text("Clean text.\n", encoding="UTF-8")
+    git("add", "doc.rst")
+    git("commit", "-q", "-m", "clean")
+    (tmp_path / "doc.rst").write_text("Dirty text. \n", encoding="UTF-8")
+    git("add", "doc.rst")
+    (tmp_path / "doc.rst").write_text("Clean again.\n", encoding="UTF-8")
+    return git
+
+
+def test_git_rev(repo, capsys):
+    assert main(["sphinxlint", "--git-rev", "HEAD"]) == 0
+    assert capsys.readouterr().out == "No problems found.\n"
+
+
+def test_staged(repo, capsys):
+    assert main(["sphinxlint", "--staged"]) == 1
+    assert "doc.rst:1: trailing whitespace" in capsys.readouterr().err
+    assert main(["sphinxlint", "--staged", "-i", "doc.rst"]) == 0
+
+
+def test_unknown_rev(repo, capsys):
+    assert main(["sphinxlint", "--git-rev", "no-such-rev"]) == 2
+    assert "cannot list files from git" in capsys.readouterr().err
+
+
+def test_diff(repo, tmp_path, capsys):
+    (tmp_path / "doc.rst").write_text(
+        "Old error \n\nUntouched paragraph.\n\nNew error \n", encoding="UTF-8"
+    )
+    repo("commit", "-q", "-am", "errors")
+    (tmp_path / "doc.rst").write_text(
+        "Old error \n\nChanged paragraph.\n\nNew error \nwith :func:`role\n",
+        encoding="UTF-8",
+    )
+    assert main(["sphinxlint", "--diff", "HEAD"]) == 1
+    err = capsys.readouterr().err
+    assert "doc.rst:6: role missing closing backtick" in err
+    assert ":1:" not in err
+    assert ":5:" not in err
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_missing_blob(repo, monkeypatch, capsys, jobs):
+    """A blob gone since it was listed is reported, the others checked."""
+    blobs = git.blobs
+
+    def blobs_and_a_missing_one(*args):
+        return [("gone.rst", "0" * 40), *blobs(*args)]
+
+    monkeypatch.setattr(git, "blobs", blobs_and_a_missing_one)
+    monkeypatch.setattr(cli, "worker_start_seconds", lambda: 1e-9)
+    assert main(["sphinxlint", "-j", jobs, "--staged"]) == 1
+    err = capsys.readouterr().err
+    assert f"gone.rst: cannot read: git cat-file: no object {'0' * 40}" in err
+    assert "doc.rst:1: trailing whitespace" in err
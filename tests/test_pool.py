@@ -0,0 +1,201 @@
+import gc
+import multiprocessing
+import time
+
+import pytest
+
+from sphinxlint.checkers import all_checkers
+from sphinxlint.cli import (
+    _check_files,
+    _worker_failure,
+    _worker_retry,
+    schedule,
+    useful_jobs,
+)
+from sphinxlint.pool import (
+    InterpreterPool,
+    SupervisedPool,
+    ThreadPool,
+    cgroup_cpu_quota,
+    interpreters_failure,
+    worker_context,
+)
+from sphinxlint.sphinxlint import CheckersOptions
+
+
+def test_supervised_pool_replaces_stuck_workers():
+    """A worker stuck on a task is killed, the remaining tasks still run."""
+    with SupervisedPool(
+        2,
+        time.sleep,
+        lambda task, reason, checker_name: (task, reason),
+        timeout=0.5,
+    ) as pool:
+        results = list(pool.imap_unordered([0, 60, 0, 0, 0]))
+    assert results.count(None) == 4
+    assert (60, "timed out after 0.5s") in results
+
+
+def sleep_all(delays):
+    for delay in delays:
+        time.sleep(delay)
+    return delays
+
+
+def test_supervised_pool_retries_the_rest_of_a_task():
+    """Only the part of a task a worker got stuck on fails."""
+    with SupervisedPool(
+        2,
+        sleep_all,
+        lambda task, reason, running: ("failed", max(task)),
+        timeout=0.5,
+        retry=lambda task, running: [d for d in task if d < 60] or None,
+    ) as pool:
+        results = list(pool.imap([[0], [0, 60, 0.1], [0.2, 60], [0]]))
+    assert results == [[0], ("failed", 60), [0, 0.1], ("failed", 60), [0.2], [0]]
+
+
+def test_worker_retry_leaves_the_running_file_out():
+    todo = (["a.rst", "b.rst", "c.rst"], set(), None)
+    running = ("b.rst", "default-role")
+    assert _worker_retry(todo, running) == (["a.rst", "c.rst"], set(), None)
+    (error,) = _worker_failure(todo, "timed out after 2s", running)
+    assert error.filename == "b.rst"
+    assert _worker_retry((["a.rst"], set(), None), running) is None
+
+
+def check_stuck(file, lines, options=None):
+    """Get stuck on files named stuck."""
+    if "stuck" in file:
+        time.sleep(60)
+    yield from ()
+
+
+check_stuck.name = "stuck"
+check_stuck.suffixes = (".rst",)
+check_stuck.enabled = check_stuck.rst_only = True
+check_stuck.whole_file = False
+check_stuck.cost = 0
+check_stuck.description = check_stuck.__doc__
+
+
+def test_supervised_pool_names_the_stuck_file(tmp_path):
+    """Workers tell the file and checker they run, so only the stuck
+    file fails, the other files of its batch being checked."""
+    names = [str(tmp_path / name) for name in ("a.rst", "stuck.rst", "c.rst")]
+    for name in names:
+        with open(name, "w", encoding="utf-8") as file:
+            file.write("A :func:`role\n")
+    checkers = {check_stuck, all_checkers["missing-backtick-after-role"]}
+    todo = (names, checkers, CheckersOptions(), True, None, 2**20, None, False)
+    with SupervisedPool(
+        1, _check_files, _worker_failure, timeout=0.5, retry=_worker_retry
+    ) as pool:
+        errors = [error for store in pool.imap([todo]) for error in store]
+    failure = next(error for error in errors if error.checker_name == "file-timeout")
+    assert failure.filename == names[1]
+    assert "while running stuck" in str(failure)
+    checked = {error.filename for error in errors if error is not failure}
+    assert checked == {names[0], names[2]}
+
+
+def test_worker_failure_is_a_distinct_error_kind():
+    (error,) = _worker_failure(
+        (["a.rst"], set(), None), "timed out after 2s", ("a.rst", "default-role")
+    )
+    assert error.checker_name == "file-timeout"
+    assert "while running default-role" in str(error)
+
+
+def test_schedule_largest_first(tmp_path):
+    checkers = set(all_checkers.values())
+    sizes = {"huge.rst": 100_000, "big.po": 20_000, "skipped.txt": 100_000}
+    sizes.update({f"small{i}.rst": 10 for i in range(50)})
+    for name, size in sizes.items():
+        (tmp_path / name).write_text("x" * size, encoding="UTF-8")
+    batches = list(schedule([str(tmp_path / name) for name in sizes], checkers, 4))
+    assert batches[0] == [str(tmp_path / "huge.rst")]
+    assert batches[1] == [str(tmp_path / "big.po")]
+    assert len(batches) < len(sizes) / 2  # small files are packed
+    assert sorted(path for batch in batches for path in batch) == sorted(
+        str(tmp_path / name) for name in sizes
+    )
+
+
+def slow_identity(delay):
+    time.sleep(delay)
+    return delay
+
+
+def test_supervised_pool_imap_keeps_order():
+    with SupervisedPool(3, slow_identity, None) as pool:
+        assert list(pool.imap([0.3, 0, 0.1, 0])) == [0.3, 0, 0.1, 0]
+
+
+def test_thread_pool_imap_keeps_order():
+    with ThreadPool(3, slow_identity) as pool:
+        assert list(pool.imap([0.3, 0, 0.1, 0])) == [0.3, 0, 0.1, 0]
+        delays = [0.02, 0, 0.01] * 5
+        assert sorted(pool.imap_unordered(delays)) == sorted(delays)
+
+
+@pytest.mark.skipif(
+    interpreters_failure() is not None, reason="no subinterpreters for sphinxlint"
+)
+def test_interpreter_pool():
+    with InterpreterPool(2, abs) as pool:
+        assert list(pool.imap([-3, 2, -1])) == [3, 2, 1]
+
+
+def test_schedule_in_order(tmp_path):
+    checkers = set(all_checkers.values())
+    paths = []
+    for i, size in enumerate([10, 10, 100_000, 10, 10]):
+        paths.append(str(tmp_path / f"{i}.rst"))
+        (tmp_path / f"{i}.rst").write_text("x" * size, encoding="UTF-8")
+    batches = list(schedule(paths, checkers, 2, in_order=True))
+    assert [path for batch in batches for path in batch] == paths
+    assert [str(tmp_path / "2.rst")] in batches
+
+
+def test_cgroup_cpu_quota(tmp_path):
+    proc_cgroup = tmp_path / "cgroup"
+    proc_cgroup.write_text("0::/ci/job\n", encoding="utf-8")
+    (tmp_path / "ci" / "job").mkdir(parents=True)
+    (tmp_path / "ci" / "job" / "cpu.max").write_text(
+        "400000 100000\n", encoding="utf-8"
+    )
+    assert cgroup_cpu_quota(tmp_path, proc_cgroup) == 4
+    (tmp_path / "ci" / "job" / "cpu.max").write_text("max 100000\n", encoding="utf-8")
+    assert cgroup_cpu_quota(tmp_path, proc_cgroup) is None
+    proc_cgroup.write_text("4:cpu,cpuacct:/ci\n3:memory:/ci\n", encoding="utf-8")
+    (tmp_path / "cpu,cpuacct" / "ci").mkdir(parents=True)
+    (tmp_path / "cpu,cpuacct" / "ci" / "cpu.cfs_quota_us").write_text(
+        "150000\n", encoding="utf-8"
+    )
+    (tmp_path / "cpu,cpuacct" / "ci" / "cpu.cfs_period_us").write_text(
+        "100000\n", encoding="utf-8"
+    )
+    assert cgroup_cpu_quota(tmp_path, proc_cgroup) == 1.5
+    assert cgroup_cpu_quota(tmp_path, tmp_path / "missing") is None
+
+
+def test_useful_jobs():
+    assert useful_jobs(0, 8) == 1
+    assert useful_jobs(10_000, 8) == 1
+    assert useful_jobs(10**12, 8) == 8
+    # Threads start quicker than processes.
+    assert useful_jobs(10**6, 8, start_seconds=0.0001) == 8
+
+
+def frozen_objects(task):
+    return gc.get_freeze_count()
+
+
+@pytest.mark.parametrize("method", multiprocessing.get_all_start_methods())
+def test_worker_context(method):
+    with SupervisedPool(
+        1, frozen_objects, _worker_failure, context=worker_context(method)
+    ) as pool:
+        (frozen,) = pool.imap_unordered([0])
+    assert frozen > 0
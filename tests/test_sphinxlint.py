@@ -1,9 +1,27 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import EntryPoint, EntryPoints
+from itertools import chain
 from pathlib import Path
 
 import pytest
 
+from sphinxlint import Linter, check_text, checkers, cli, rst, sphinxlint
+from sphinxlint.baseline import Baseline
+from sphinxlint.checkers import all_checkers
 from sphinxlint.cli import main
-from sphinxlint.utils import paragraphs
+from sphinxlint.shared import Segments, SharedBatch
+from sphinxlint.sphinxlint import Chunk, ErrorStore, LintError
+from sphinxlint.utils import (
+    PER_FILE_CACHES,
+    Lines,
+    MemoCache,
+    hide_non_rst_blocks,
+    paragraphs,
+    per_file_cache,
+)
 
 FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
 
@@ -81,6 +99,17 @@ def test_paragraphs(file):
         assert firstpline == lines[lno - 1]
 
 
+@pytest.mark.parametrize("file", [str(FIXTURE_DIR / "paragraphs.rst")])
+def test_lines(file):
+    text = Path(file).read_text(encoding="UTF-8") + "no\x0cfinal\u2028newline"
+    lines = tuple(text.splitlines(keepends=True))
+    assert tuple(Lines(text)) == lines
+    assert Lines(text)[-1] == lines[-1]
+    rst_only = hide_non_rst_blocks(Lines(text))
+    assert tuple(rst_only) == hide_non_rst_blocks(lines)
+    assert paragraphs(rst_only) == paragraphs(hide_non_rst_blocks(lines))
+
+
 @pytest.mark.parametrize("file", [str(FIXTURE_DIR / "paragraphs.rst")])
 def test_line_no_in_error_msg(file, capsys):
     has_errors = main(["sphinxlint.py", file])
@@ -90,3 +119,474 @@ def test_line_no_in_error_msg(file, capsys):
     assert "paragraphs.rst:70: role use a single backtick" in err
     assert "paragraphs.rst:65: inline literal missing (escaped) space" in err
     assert has_errors
+
+
+def test_linter_reuse():
+    linter = Linter(all_checkers.values())
+    text = (FIXTURE_DIR / "paragraphs.rst").read_text(encoding="UTF-8")
+    expected = set(check_text("paragraphs.rst", text, all_checkers.values()))
+    assert expected
+    assert set(linter.lint_text("paragraphs.rst", text)) == expected
+    assert set(linter.lint_text("paragraphs.rst", text)) == expected
+    assert linter.lint_text("paragraphs.txt", text) == []
+    (errors,) = linter.lint_many([str(FIXTURE_DIR / "paragraphs.rst")])
+    assert {error.line_no for error in errors} == {error.line_no for error in expected}
+
+
+def test_error_store():
+    errors = check_text(
+        "paragraphs.rst",
+        (FIXTURE_DIR / "paragraphs.rst").read_text(encoding="UTF-8"),
+        all_checkers.values(),
+    )
+    store = ErrorStore()
+    store.extend(errors)
+    merged = ErrorStore()
+    merged.extend(["unreadable.rst: cannot open: oops"])
+    merged.extend(store)
+    assert list(merged) == ["unreadable.rst: cannot open: oops", *errors]
+    assert merged.filenames == ["paragraphs.rst"]
+    per_checker, per_file = merged.statistics()
+    assert per_file == {"paragraphs.rst": len(errors)}
+    assert sum(per_checker.values()) == len(errors)
+
+
+def test_lazy_messages():
+    text = (FIXTURE_DIR / "paragraphs.rst").read_text(encoding="UTF-8")
+    errors = check_text("paragraphs.rst", text, all_checkers.values())
+    linter = Linter(all_checkers.values(), lazy_messages=True)
+    lazy_errors = linter.lint_text("paragraphs.rst", text)
+    assert any(isinstance(error.msg, tuple) for error in lazy_errors)
+    store = ErrorStore()
+    store.extend(lazy_errors)
+    assert list(store) == errors
+
+
+def test_statistics_dont_format_messages(monkeypatch, capsys):
+    formatted = []
+    monkeypatch.setattr(sphinxlint, "format_message", formatted.append)
+    main(["sphinxlint", "-j", "1", "--statistics", str(FIXTURE_DIR / "xfail")])
+    assert "errors in total" in capsys.readouterr().out
+    assert formatted == []
+
+
+def test_statistics(capsys):
+    has_errors = main([
+        "sphinxlint.py",
+        "--statistics",
+        str(FIXTURE_DIR / "paragraphs.rst"),
+    ])
+    out, err = capsys.readouterr()
+    assert has_errors
+    assert err == ""
+    assert "       2 missing-colon-in-role\n" in out
+    assert out.endswith(" errors in total\n")
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_max_errors(jobs, capsys, monkeypatch):
+    monkeypatch.setattr(cli, "worker_start_seconds", lambda: 1e-9)
+    xfail = str(FIXTURE_DIR / "xfail")
+    assert main(["sphinxlint.py", "-j", jobs, "--enable", "all", "-x", xfail])
+    _out, err = capsys.readouterr()
+    assert len(err.splitlines()) == 1
+    assert main(["sphinxlint.py", "-j", jobs, "--max-errors", "3", xfail])
+    _out, err = capsys.readouterr()
+    assert len(err.splitlines()) == 3
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "many"])
+def test_max_errors_must_be_positive(value, capsys):
+    with pytest.raises(SystemExit):
+        main(["sphinxlint.py", "--max-errors", value, str(FIXTURE_DIR / "xfail")])
+    assert "--max-errors: expected" in capsys.readouterr().err
+
+
+def test_cheapest_checkers_first():
+    linter = Linter(all_checkers.values())
+    assert linter.plans[".rst"][0].name == "missing-final-newline"
+    costs = [check.cost for check in linter.plans[".rst"]]
+    assert costs == sorted(costs)
+    text = "A :func:`role \n"
+    assert (
+        len(Linter(all_checkers.values(), max_errors=1).lint_text("a.rst", text)) == 1
+    )
+    error = next(linter.iter_text("a.rst", text))
+    assert error.checker_name == "trailing-whitespace"
+
+
+def test_plugin_checkers(tmp_path, monkeypatch, capsys):
+    (tmp_path / "shouting_plugin.py").write_text(
+        '''def check_shouting(file, lines, options=None):
+    """Check for lines written in capitals."""
+    for lno, line in enumerate(lines, start=1):
+        if line.strip().isupper():
+            yield lno, "don't shout"
+''',
+        encoding="utf-8",
+    )
+    (tmp_path / "shouting_spec.py").write_text(
+        """SHOUTING = {
+    "checker": "shouting_plugin:check_shouting",
+    "suffixes": [".rst"],
+    "enabled": False,
+    "description": "Check for lines written in capitals.",
+}
+""",
+        encoding="utf-8",
+    )
+    monkeypatch.syspath_prepend(tmp_path)
+    plugins = EntryPoints([
+        EntryPoint("shouting", "shouting_spec:SHOUTING", "sphinxlint.checkers")
+    ])
+    monkeypatch.setattr(checkers, "entry_points", lambda group: plugins)
+    (tmp_path / "a.rst").write_text("HELLO\n", encoding="utf-8")
+    try:
+        assert main(["sphinx-lint", "--list"]) == 0
+        assert main(["sphinx-lint", "--list", "--verbose"]) == 0
+        out = capsys.readouterr().out
+        assert "- shouting: Check for lines written in capitals." in out
+        assert "shouting_plugin" not in sys.modules
+        assert main(["sphinx-lint", str(tmp_path / "a.rst")]) == 0
+        assert "shouting_plugin" not in sys.modules
+        assert main(["sphinx-lint", "--enable", "shouting", str(tmp_path)]) == 1
+        assert "a.rst:1: don't shout (shouting)" in capsys.readouterr().err
+    finally:
+        all_checkers.pop("shouting", None)
+        sys.modules.pop("shouting_plugin", None)
+        sys.modules.pop("shouting_spec", None)
+
+
+@pytest.mark.parametrize("file", [str(f) for f in (FIXTURE_DIR / "xfail").iterdir()])
+def test_paragraph_checkers_single_walk(file):
+    """Paragraph checkers find the same errors, in the same order, when
+    run together or one by one."""
+    text = Path(file).read_text(encoding="UTF-8")
+    enabled = [check for check in all_checkers.values() if check.enabled]
+    alone = [
+        error
+        for check in Linter(enabled).plans.get(Path(file).suffix, ())
+        for error in Linter([check]).lint_text(file, text)
+    ]
+    assert Linter(enabled).lint_text(file, text) == alone
+
+
+def test_max_errors_skips_the_paragraph_walk():
+    """Else all paragraph checkers would run on the whole file first."""
+    enabled = [check for check in all_checkers.values() if check.enabled]
+    assert Linter(enabled).paragraph_checkers[".rst"].checkers
+    linter = Linter(enabled, max_errors=2)
+    assert not linter.paragraph_checkers[".rst"].checkers
+    text = "A :func:`role\n\nA ``literal``x\n\n" * 100
+    assert (
+        linter.lint_text("a.rst", text) == Linter(enabled).lint_text("a.rst", text)[:2]
+    )
+
+
+@pytest.mark.parametrize("max_errors", [None, 1])
+def test_per_file_caches_are_cleared(max_errors):
+    text = "A :func:`role \n\nSee `Python<https://python.org>`.\n"
+    Linter(all_checkers.values(), max_errors=max_errors).lint_text("a.rst", text)
+    check_text("a.rst", text, all_checkers.values())
+    assert not [cache for cache in PER_FILE_CACHES if cache.local.__dict__.get("data")]
+
+
+def test_memo_cache():
+    cache = MemoCache(str.upper, max_size=3 * (sys.getsizeof("a") * 2))
+    assert [cache(letter) for letter in "abcab"] == list("ABCAB")
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 3, 0)
+    cache("d")  # Evicts "c", the least recently used.
+    assert list(cache.data) == ["a", "b", "d"]
+    assert cache.evictions == 1
+
+
+def test_cache_statistics(capsys):
+    main(["sphinxlint", "--verbose", str(FIXTURE_DIR / "xpass")])
+    assert "Cache clean_paragraph: " in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("sort_by", ["filename", "line,filename", "error_type,line"])
+def test_sort_spilling_to_disk(sort_by, monkeypatch, capsys):
+    main(["sphinxlint", "-j", "1", "-s", sort_by, str(FIXTURE_DIR / "xfail")])
+    in_memory = capsys.readouterr().err
+    monkeypatch.setattr(cli, "SORT_CHUNK_SIZE", 3)
+    main(["sphinxlint", "-j", "1", "-s", sort_by, str(FIXTURE_DIR / "xfail")])
+    assert capsys.readouterr().err == in_memory
+
+
+@pytest.mark.parametrize("sort_by", [[], ["-s", "filename"]])
+def test_thread_executor(sort_by, monkeypatch, capsys):
+    args = ["--enable", "all", *sort_by, str(FIXTURE_DIR / "xfail")]
+    main(["sphinxlint", "-j", "1", *args])
+    sequential = capsys.readouterr().err
+    monkeypatch.setattr(cli, "THREAD_START_SECONDS", 1e-9)
+    main(["sphinxlint", "-j", "4", "--executor", "thread", *args])
+    threaded = capsys.readouterr().err
+    if sort_by:
+        assert threaded == sequential
+    else:
+        assert sorted(threaded.splitlines()) == sorted(sequential.splitlines())
+
+
+@pytest.mark.parametrize("executor", ["thread", "interpreter"])
+def test_only_processes_are_supervised(executor, capsys):
+    args = ["--executor", executor, "--file-timeout", "1"]
+    assert main(["sphinxlint", *args, str(FIXTURE_DIR / "xpass")]) == 2
+    assert "need the process executor" in capsys.readouterr().err
+
+
+def test_interpreter_executor_falls_back(monkeypatch, capsys):
+    xfail = str(FIXTURE_DIR / "xfail")
+    main(["sphinxlint", "-j", "1", xfail])
+    sequential = capsys.readouterr().err
+    monkeypatch.setattr(cli, "INTERPRETER_START_SECONDS", 1e-9)
+    monkeypatch.setattr(cli, "interpreters_failure", lambda: "regex refused")
+    main(["sphinxlint", "-v", "-j", "2", "--executor", "interpreter", xfail])
+    err = capsys.readouterr().err
+    assert "subinterpreters (regex refused), using processes" in err
+    assert "Checked with: 2 processes\n" in err
+    assert set(sequential.splitlines()) <= set(err.splitlines())
+
+
+def test_per_file_cache_per_thread():
+    calls = []
+
+    @per_file_cache
+    def cached(lines):
+        calls.append(lines)
+        return len(calls)
+
+    assert cached("a") == cached("a") == 1
+    with ThreadPoolExecutor(1) as executor:
+        assert executor.submit(cached, "a").result() == 2
+    assert cached("a") == 1
+
+
+def test_sort_by_filename_streams():
+    def results():
+        yield [LintError("a.rst", 2, "b", "x"), LintError("a.rst", 1, "a", "x")]
+        raise AssertionError("should not be consumed yet")
+
+    errors = cli.sort_errors(
+        results(), [cli.SortField.FILENAME, cli.SortField.LINE], in_order=True
+    )
+    assert [next(errors).line_no, next(errors).line_no] == [1, 2]
+
+
+def test_shard_partitions_by_size():
+    sizes = {"huge.rst": 100, "a.rst": 40, "b.rst": 30, "c.rst": 30}
+    shards = [cli.shard(list(sizes), i, 2, sizes.get) for i in (1, 2)]
+    assert shards == [["huge.rst"], ["a.rst", "b.rst", "c.rst"]]
+
+
+def test_shards_merge(tmp_path, monkeypatch, capsys):
+    reports = []
+    for index in (1, 2, 3):
+        main(
+            ["sphinxlint", "--shard", f"{index}/3", "--format", "json"]
+            + [str(FIXTURE_DIR / "xfail")]
+        )
+        reports.append(tmp_path / f"shard{index}.jsonl")
+        reports[-1].write_text(capsys.readouterr().out, encoding="utf-8")
+    assert all(report.stat().st_size for report in reports)
+    assert main(["sphinxlint", "--merge", *map(str, reports)]) == 1
+    merged = capsys.readouterr().err
+    main(["sphinxlint", "--sort-by", "filename,line", str(FIXTURE_DIR / "xfail")])
+    assert merged == capsys.readouterr().err
+
+
+def test_merge_is_not_a_subcommand(tmp_path, monkeypatch, capsys):
+    """A directory named merge is checked, as any other."""
+    (tmp_path / "merge").mkdir()
+    (tmp_path / "merge" / "a.rst").write_text("trailing \n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    assert main(["sphinxlint", "merge"]) == 1
+    assert "merge/a.rst:1: trailing whitespace" in capsys.readouterr().err
+
+
+def test_shared_scans(monkeypatch):
+    """The hyperlink checkers share a single scan of each line."""
+    scanned = []
+
+    class CountingPattern:
+        def finditer(self, line, **kwargs):
+            scanned.append(line)
+            return pattern.finditer(line, **kwargs)
+
+    pattern = rst.SEEMS_HYPERLINK_RE
+    monkeypatch.setattr(rst, "SEEMS_HYPERLINK_RE", CountingPattern())
+    errors = Linter(all_checkers.values()).lint_text(
+        "a.rst", "See `Python<https://python.org>`.\n"
+    )
+    assert {error.checker_name for error in errors} >= {
+        "missing-space-in-hyperlink",
+        "missing-underscore-after-hyperlink",
+    }
+    assert len(scanned) == 1
+
+
+@pytest.mark.parametrize(
+    "file", [str(f) for f in (FIXTURE_DIR / "xfail").iterdir() if f.suffix == ".rst"]
+)
+def test_chunks_give_the_same_errors(file):
+    linter = Linter(all_checkers.values())
+    split = linter.split_file(file, size=1)
+    if split is None:
+        return  # Nowhere to cut this one.
+    text, chunks = split
+    assert not any(chunk.whole_file for chunk in chunks)
+    assert "".join(chunk.text for chunk in chunks) == text
+    errors = chain.from_iterable(linter.lint_chunk(chunk) for chunk in chunks)
+    assert linter.merge_chunks(file, text, errors) == linter.lint_file(file)
+
+
+def check_last_line(file, lines, options=None):
+    """Look at the last line of the file."""
+    if lines and lines[-1].startswith("Last"):
+        yield len(lines), "last line"
+
+
+check_last_line.name = "last-line"
+check_last_line.suffixes = (".rst",)
+check_last_line.enabled = check_last_line.whole_file = True
+check_last_line.rst_only = False
+check_last_line.cost = 0
+check_last_line.description = check_last_line.__doc__
+
+
+def test_whole_file_checkers_run_in_a_chunk(tmp_path):
+    """Not when merging, so they run in (supervised) workers."""
+    text = "Paragraph.\n\n" * 10 + "Last line, no final newline."
+    (tmp_path / "a.rst").write_text(text, encoding="utf-8")
+    file = str(tmp_path / "a.rst")
+    linter = Linter([check_last_line, all_checkers["missing-final-newline"]])
+    _, chunks = linter.split_file(file, size=1)
+    assert chunks[0] == Chunk(file, 0, text, whole_file=True)
+    assert linter.merge_chunks(file, text, []) == []
+    errors = chain.from_iterable(linter.lint_chunk(chunk) for chunk in chunks)
+    merged = linter.merge_chunks(file, text, errors)
+    assert merged == linter.lint_text(file, text)
+    assert [error.checker_name for error in merged] == [
+        "last-line",
+        "missing-final-newline",
+    ]
+
+
+def test_chunks_with_a_baseline_and_max_errors(tmp_path):
+    """Errors are limited once the baseline is applied to all chunks."""
+    text = "".join(f"Line {i} :func:`role\n\n" for i in range(40))
+    (tmp_path / "a.rst").write_text(text, encoding="utf-8")
+    file = str(tmp_path / "a.rst")
+    record = Baseline()
+    Linter(all_checkers.values(), record=record).lint_text(file, text[:200])
+    linter = Linter(all_checkers.values(), max_errors=2, baseline=record)
+    _, chunks = linter.split_file(file, size=400)
+    assert len(chunks) > 1
+    errors = chain.from_iterable(linter.lint_chunk(chunk) for chunk in chunks)
+    merged = linter.merge_chunks(file, text, errors)
+    assert merged == linter.lint_text(file, text)
+    assert not linter.stale
+
+
+def test_failed_chunks_dont_make_stale_baseline_entries(tmp_path):
+    text = "".join(f"Line {i} :func:`role\n\n" for i in range(40))
+    (tmp_path / "a.rst").write_text(text, encoding="utf-8")
+    file = str(tmp_path / "a.rst")
+    record = Baseline()
+    Linter(all_checkers.values(), record=record).lint_text(file, text)
+    linter = Linter(all_checkers.values(), baseline=record)
+    _, chunks = linter.split_file(file, size=1)
+    failure = LintError(file, 0, "worker timed out", "file-timeout")
+    errors = [failure, *linter.lint_chunk(chunks[-1])]
+    assert linter.merge_chunks(file, text, errors) == [failure]
+    assert not linter.stale
+
+
+def test_big_files_are_checked_in_chunks(tmp_path, monkeypatch, capsys):
+    text = (FIXTURE_DIR / "paragraphs.rst").read_text(encoding="UTF-8")
+    (tmp_path / "big.rst").write_text(text * 20, encoding="UTF-8")
+    main(["sphinxlint", "-j", "1", str(tmp_path)])
+    sequential = capsys.readouterr().err
+    splits = []
+    split_file = Linter.split_file
+
+    def spied_split_file(*args):
+        splits.append(split_file(*args))
+        return splits[-1]
+
+    monkeypatch.setattr(Linter, "split_file", spied_split_file)
+    monkeypatch.setattr(cli, "MIN_CHUNK_SIZE", 1)
+    monkeypatch.setattr(cli, "worker_start_seconds", lambda: 1e-9)
+    main(["sphinxlint", "-j", "2", str(tmp_path)])
+    assert capsys.readouterr().err == sequential
+    assert len(splits[0][1]) > 1
+
+
+def test_big_file_chunks_go_through_shared_memory(tmp_path, monkeypatch, capsys):
+    text = (FIXTURE_DIR / "paragraphs.rst").read_text(encoding="UTF-8")
+    (tmp_path / "big.rst").write_text(text * 200, encoding="UTF-8")
+    main(["sphinxlint", "-j", "1", str(tmp_path)])
+    sequential = capsys.readouterr().err
+    shared, freed = [], []
+    share, free = Segments.share, Segments.free
+
+    def spied_share(self, batch):
+        shared.append(share(self, batch))
+        return shared[-1]
+
+    def spied_free(self, name):
+        freed.append(name)
+        free(self, name)
+
+    monkeypatch.setattr(Segments, "share", spied_share)
+    monkeypatch.setattr(Segments, "free", spied_free)
+    monkeypatch.setattr(cli, "worker_start_seconds", lambda: 1e-9)
+    main(["sphinxlint", "-j", "2", "--executor", "process", str(tmp_path)])
+    assert capsys.readouterr().err == sequential
+    shared = [batch for batch in shared if isinstance(batch, SharedBatch)]
+    assert len(shared) > 1
+    assert not any(batch.chunk.whole_file for batch in shared)
+    assert sorted(freed) == sorted(batch.segment for batch in shared)
+
+
+def test_walk_in_threads(tmp_path):
+    for name in ("a/b/c.rst", "a/d.rst", "a/ignored/e.rst", "f/g.rst", "h.rst"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("Hello\n", encoding="utf-8")
+    expected = [
+        os.path.join(root, file)
+        for root, dirs, files in os.walk(tmp_path)
+        if "ignored" not in root
+        for file in files
+    ]
+    assert list(cli.walk(str(tmp_path), ["ignored"])) == expected
+    assert len(expected) == 4
+
+
+def test_read_ahead(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "READ_AHEAD", 1)
+    (tmp_path / "a.rst").write_bytes(b"A\n")
+    (tmp_path / "b.py").write_bytes(b"B\n")
+    items = [str(tmp_path / name) for name in ("a.rst", "missing.rst", "b.py")]
+    items.append((str(tmp_path / "a.rst"), frozenset({1})))
+    assert list(cli.read_ahead(items, {".rst"})) == [
+        (items[0], b"A\n"),
+        *items[1:],
+    ]
+
+
+def test_io_threads_are_kept(tmp_path):
+    """Reading and walking reuse the same threads across calls."""
+    (tmp_path / "a.rst").write_bytes(b"A\n")
+    list(cli.walk(str(tmp_path), []))
+    threads = threading.active_count()
+    for _ in range(3):
+        list(cli.read_ahead([str(tmp_path / "a.rst")], {".rst"}))
+        list(cli.walk(str(tmp_path), []))
+    assert threading.active_count() == threads
+    if not hasattr(os, "fork"):
+        return
+    child = os.fork()
+    if child == 0:  # Threads don't survive a fork, new ones are started.
+        os._exit(0 if list(cli.walk(str(tmp_path), [])) else 1)
+    assert os.waitpid(child, 0)[1] == 0